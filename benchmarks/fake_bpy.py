@@ -0,0 +1,106 @@
+import sys
+import types
+
+import numpy as np
+
+
+class Vector(tuple):
+    """Stand-in for mathutils.Vector, values are rounded to float32 like Blender's"""
+
+    def __new__(cls, values):
+        return super().__new__(cls, (float(np.float32(value)) for value in values))
+
+class Matrix(tuple):
+    """Stand-in for mathutils.Matrix, only constructed by the importer"""
+
+class UVData:
+    """Loops of a UV layer held in one float32 array, with bpy's bulk accessors"""
+
+    def __init__(self, uvs):
+        self.uvs = np.ascontiguousarray(uvs, dtype=np.float32).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.uvs)
+
+    def foreach_get(self, attr, buffer):
+        buffer[:] = self.uvs.ravel()
+
+    def foreach_set(self, attr, buffer):
+        self.uvs[:] = np.asarray(buffer, dtype=np.float32).reshape(-1, 2)
+
+class UVLayer:
+    def __init__(self, uvs):
+        self.data = UVData(uvs)
+
+class Mesh:
+    def __init__(self, uv_layers):
+        self.uv_layers = uv_layers
+        self.materials = []
+        self.users = 1
+
+class Object:
+    """Stand-in for a bpy object, with the item access of its custom properties"""
+
+    def __init__(self, name, data=None):
+        self.name = name
+        self.data = data
+        self.parent = None
+        self.properties = {}
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+    def __setitem__(self, key, value):
+        self.properties[key] = value
+
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
+
+class Collection(list):
+    """Stand-in for a bpy.data collection"""
+
+    def remove(self, item, **kwargs):
+        super().remove(item)
+
+"""Returns an object whose mesh has layers UV layers of loops random coordinates"""
+def make_uv_object(loops, layers=1, seed=0):
+    random = np.random.default_rng(seed)
+    uv_layers = [UVLayer(random.uniform(-1, 2, size=(loops, 2))) for i in range(layers)]
+    return Object('bench', Mesh(uv_layers))
+
+"""Registers in-memory bpy, bmesh and mathutils modules, unless real ones are already loaded
+
+Only what importing pbr_importer.builders and running its pure Python paths needs
+is provided: no operator, image or render does anything.
+"""
+def install():
+    if 'bpy' in sys.modules:
+        return sys.modules['bpy']
+
+    bpy = types.ModuleType('bpy')
+    bpy.data = types.SimpleNamespace(
+        objects=Collection(),
+        meshes=Collection(),
+        materials=Collection(),
+        images=Collection(),
+        lights=Collection(),
+        cameras=Collection(),
+    )
+    bpy.context = types.SimpleNamespace(scene=None, collection=None, view_layer=None)
+    bpy.ops = types.SimpleNamespace()
+    bpy.types = types.SimpleNamespace(Operator=object, Panel=object)
+    bpy.props = types.SimpleNamespace()
+    bpy.app = types.SimpleNamespace(handlers=types.SimpleNamespace(persistent=lambda function: function, save_pre=[]))
+
+    mathutils = types.ModuleType('mathutils')
+    mathutils.Vector = Vector
+    mathutils.Matrix = Matrix
+
+    # Only imported by pbr_importer.primitives, no benchmark builds a mesh
+    bmesh = types.ModuleType('bmesh')
+
+    sys.modules['bpy'] = bpy
+    sys.modules['bmesh'] = bmesh
+    sys.modules['mathutils'] = mathutils
+
+    return bpy
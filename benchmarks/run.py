@@ -0,0 +1,185 @@
+#########################################################################################################################################
+#
+# Headless benchmarks of the pure Python paths of the importer, no Blender needed: python benchmarks/run.py [options]
+#
+# arguments:
+# [-h] -> help
+# --objects N -> objects in the synthetic scene (int)
+# --textures N -> texture maps per material, 0 to 4 (int)
+# --duplicates RATIO -> share of objects repeating an earlier one (float)
+# --loops N -> UV loops of the synthetic mesh (int)
+# --cache_entries N -> files in the synthetic asset cache (int)
+# --repeat N -> timed runs per benchmark, the median is reported (int)
+# --filter TEXT -> only run benchmarks whose name contains TEXT (string)
+# --output OUTPUT -> write the results as json (string)
+# --compare BASELINE -> print the change against results written by an earlier run (string)
+#
+#########################################################################################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+# Make the pbr_importer package importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+import scenes
+
+
+"""Returns min, median and mean seconds of repeat calls of function"""
+def measure(function, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times), 'runs': repeat}
+
+"""Returns (name, function) pairs of every benchmark, built from the synthetic inputs"""
+def make_benchmarks(args, work_dir):
+    fake_bpy.install()
+    from pbr_importer import builders
+    from pbr_importer.colors import rgb_int2tuple, linear_from_int, rgb_to_hsv, hsv_to_rgb
+    from pbr_importer.cache import AssetCache
+    from pbr_importer.prefetch import collect_assets
+    from pbr_importer.scene_diff import scene_state, diff_states
+    from pbr_importer.signatures import material_signature, object_mesh_signatures
+    from pbr_importer.stream import load_scene
+
+    scene = scenes.make_scene(args.objects, args.textures, args.duplicates)
+    moved = scenes.make_scene(args.objects, args.textures, args.duplicates)
+    for obj in moved['objects'][::10]:
+        obj['position'] = [0, 0, 0]
+
+    scene_path = os.path.join(work_dir, 'scene.json')
+    with open(scene_path, mode='w') as file:
+        json.dump(scene, file)
+
+    colors = list(range(0, 1 << 24, max(1, (1 << 24) // 10000)))
+
+    def colour_conversions():
+        for color in colors:
+            rgb_to_hsv(*linear_from_int(color))
+
+    def hsv_roundtrip():
+        for color in colors:
+            hsv_to_rgb(*rgb_to_hsv(*rgb_int2tuple(color)))
+
+    uv_object = fake_bpy.make_uv_object(args.loops)
+    layered_object = fake_bpy.make_uv_object(args.loops, layers=2)
+
+    # Cache holding synthetic files, read offline so nothing touches the network
+    cache_path = os.path.join(work_dir, 'cache')
+    cache = AssetCache(cache_path, offline=True)
+    urls = ["https://assets.example.com/cache/{0:06d}.png".format(n) for n in range(args.cache_entries)]
+    for url in urls:
+        path = cache.filename(url, '.png')
+        content = url.encode()
+        with open(path, mode='wb') as file:
+            file.write(content)
+        cache.store(url, path, len(content), hashlib.sha256(content).hexdigest())
+
+    def cache_fetch():
+        for url in urls:
+            cache.fetch(url, '.png')
+
+    def signatures():
+        for obj in scene['objects']:
+            material = obj['materialData']
+            material_signature(material.get('files'), 'medium', material['materialProps'])
+            object_mesh_signatures(obj, 'gltf_original')
+
+    def stdlib_json():
+        with open(scene_path, mode='r') as file:
+            json.load(file)
+
+    return [
+        ('colour.linear_to_hsv', colour_conversions),
+        ('colour.hsv_roundtrip', hsv_roundtrip),
+        ('uv.scale_uv', lambda: builders.scale_uv(uv_object, 2, 2)),
+        ('uv.flip_uvs_y', lambda: builders.flip_uvs_y(layered_object)),
+        ('json.stdlib_load', stdlib_json),
+        ('json.load_scene', lambda: load_scene(scene_path, 'gltf_original')),
+        ('cache.fetch_hits', cache_fetch),
+        ('plan.collect_assets', lambda: collect_assets(scene, 'large', 'gltf_original')),
+        ('plan.signatures', signatures),
+        ('plan.scene_diff', lambda: diff_states(scene_state(scene), scene_state(moved))),
+    ]
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+"""Prints the median of each benchmark next to the one of a baseline run"""
+def print_comparison(results, baseline):
+    print("{0:<24} {1:>12} {2:>12} {3:>8}".format('benchmark', 'baseline', 'current', 'change'))
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print("{0:<24} {1:>12} {2:>12.6f} {3:>8}".format(name, '-', result['median'], 'new'))
+            continue
+        change = (result['median'] / before['median'] - 1) * 100 if before['median'] > 0 else 0
+        print("{0:<24} {1:>12.6f} {2:>12.6f} {3:>+7.1f}%".format(name, before['median'], result['median'], change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/run.py')
+    parser.add_argument('--objects', help="objects in the synthetic scene", type= int, default= 2000)
+    parser.add_argument('--textures', help="texture maps per material", type= int, default= 3)
+    parser.add_argument('--duplicates', help="share of objects repeating an earlier one", type= float, default= 0.5)
+    parser.add_argument('--loops', help="UV loops of the synthetic mesh", type= int, default= 200000)
+    parser.add_argument('--cache_entries', help="files in the synthetic asset cache", type= int, default= 500)
+    parser.add_argument('--repeat', help="timed runs per benchmark", type= int, default= 5)
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this", type= str, default= '')
+    parser.add_argument('--output', help="results json path", type= str, default= None)
+    parser.add_argument('--compare', help="results json of a baseline run", type= str, default= None)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='pbr-bench-')
+    try:
+        results = {}
+        for name, function in make_benchmarks(args, work_dir):
+            if args.filter not in name:
+                continue
+            results[name] = measure(function, args.repeat)
+            print("{0:<24} median {1:.6f}s  min {2:.6f}s".format(name, results[name]['median'], results[name]['min']))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': vars(args),
+        },
+        'results': results,
+    }
+
+    if args.output is not None:
+        with open(args.output, mode='w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, mode='r') as file:
+            print_comparison(results, json.load(file))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import random
+
+
+# Primitive object names built from cache/<shape>.glb
+PRIMITIVES = ('Sphere', 'Cube', 'Plane', 'Cylinder')
+
+# Texture maps of a material, in the order they are given to a material
+TEXTURE_MAPS = ('color', 'normal', 'roughness', 'displacement')
+
+def _url(kind, n, ext):
+    return "https://assets.example.com/{0}/{1:06d}{2}".format(kind, n, ext)
+
+def _material(rng, n, textures):
+    files = {}
+    for texture in TEXTURE_MAPS[:textures]:
+        for size in ('medium', 'large'):
+            files[size + '_' + texture] = _url(size + '_' + texture, n, '.png')
+
+    props = {
+        'metalness': round(rng.random(), 3),
+        'roughness': round(rng.random(), 3),
+        'color': rng.randrange(0, 1 << 24),
+        'textureRepeat': rng.choice([None, 1, 2, 4]),
+    }
+
+    material = {'materialProps': props}
+    if textures > 0:
+        material['files'] = files
+    return material
+
+def _transform(rng):
+    return {
+        'position': [rng.uniform(-50, 50), rng.uniform(0, 5), rng.uniform(-50, 50)],
+        'rotation': [0, rng.uniform(0, 6.28), 0],
+        'scale': [1, 1, 1],
+    }
+
+def _object(rng, n, textures):
+    kind = rng.random()
+    if kind < 0.3:
+        obj = {'name': rng.choice(PRIMITIVES), 'type': 'mesh'}
+    elif kind < 0.9:
+        obj = {'name': "model-{0}".format(n), 'type': 'gltf', 'files': {
+            'medium': _url('glb-medium', n, '.glb'),
+            'gltf_original': _url('glb', n, '.glb'),
+        }}
+    else:
+        obj = {'name': "frame-{0}".format(n), 'type': 'dynamic', 'files': {'medium': _url('frame', n, '.glb')},
+            'dynamicMaterialProps': {
+                'files': _url('picture', n, '.png'),
+                'width': 512,
+                'height': 512,
+                'repeat': {'x': 1, 'y': 1},
+                'offset': {'x': 0, 'y': 0},
+            }}
+
+    obj['materialData'] = _material(rng, n, textures)
+    return obj
+
+"""Returns a scene dict of count objects
+
+textures is the number of texture maps per material (0 to 4) and
+duplicates the share of objects that repeat the files and material of an
+earlier object, like copies of the same model placed around a room.
+"""
+def make_scene(count, textures=3, duplicates=0.5, seed=0):
+    rng = random.Random(seed)
+    objects = []
+    for n in range(count):
+        if len(objects) > 0 and rng.random() < duplicates:
+            obj = dict(rng.choice(objects))
+        else:
+            obj = _object(rng, n, textures)
+        obj.update(_transform(rng))
+        objects.append(obj)
+
+    return {
+        'camera': {
+            'position': {'x': 0, 'y': 2, 'z': 10},
+            'rotation': {'_x': 0, '_y': 0, '_z': 0},
+            'object': {'fov': 50, 'focus': 10},
+        },
+        'light': {'position': {'x': 0, 'y': 10, 'z': 0}, 'object': {'intensity': 1, 'color': 16777215, 'name': 'light'}},
+        'environment': _url('hdri', 0, '.hdr'),
+        'floor': {'name': 'floor', 'files': _material(rng, count, textures).get('files', {}), 'materialProps': {}},
+        'objects': objects,
+    }
@@ -4,669 +4,57 @@
 #
 # arguments:
 # [-h] -> help
-# --input INPUT -> input directory (string)
+# --input INPUT -> scene json file, directory of scene files, glob pattern or .jsonl manifest (string)
 # --output OUTPUT -> output directory (string)
 # --width WIDTH -> render width (int)
 # --height HEIGHT -> render height (int)
 # --samples SAMPLES -> max render samples (int)
-# --texture_size SIZE -> texture size (string)
+# --texture_size SIZE -> texture size: small, medium, large, or auto to size each object's textures to its projected size through the camera (string)
+# --texture_budget BYTES -> with --texture_size auto, texture sizes are lowered until decoded textures fit (int)
 # --mesh_size SIZE -> mesh size (string)
+# --prefetch_workers N -> parallel asset downloads (int)
+# --preprocess_workers N -> processes decoding, resizing and converting textures before bpy loads them, 0 disables (int)
+# --cache_dir DIR -> asset cache directory (string)
+# --cache_max_bytes BYTES -> asset cache size budget, least recently used files are evicted (int)
+# --cache_ttl SECONDS -> revalidate cached assets older than this with the server (int)
+# --offline -> never use the network, fail on assets missing from the cache
+# --download_retries N -> retries of failed asset downloads (int)
+# --insecure -> do not verify TLS certificates of asset servers
+# --threads N -> render threads, 0 uses all cores (int)
+# --report REPORT -> batch status report path, defaults to report.json in the output directory (string)
+# --trace FORMATS -> comma separated per scene trace files next to the render: json, csv, chrome (string)
+# --snapshot_dir DIR -> save each built scene as a .blend keyed by its json and asset sizes, later renders of it open the file (string)
+# --snapshot_max_bytes BYTES -> snapshot folder size budget, least recently used snapshots are evicted (int)
+# --rebuild -> build scenes even when a snapshot exists and replace it
+# --dry-run -> print the build plan of each scene as json and exit without rendering, runs without Blender:
+#              python pbr_import.py -- --dry-run --input INPUT --output OUTPUT [options]
+# --probe -> with --dry-run, ask the asset servers for the size of assets missing from the cache
 #
 #########################################################################################################################################
 
-from random import sample
-import bpy, os
-from mathutils import Matrix, Vector
-from urllib import request 
-import math
+import os
 import sys
 import json
 import ssl
-import hashlib
+import time
 import argparse
+import traceback
 
+# Make the pbr_importer package importable when run through blender --python
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Create cache folder path if not existing
-CACHE_PATH = "cache"
-if not os.path.exists(CACHE_PATH):
-    os.mkdir(CACHE_PATH)
-
-#=================================================================================
-#COLOR CONVERSIONS
-#=================================================================================
-def rgb_int2tuple(rgbint):
-  return ( rgbint // 256 // 256 % 256, rgbint // 256 % 256, rgbint % 256)
-
-def srgb_to_linear(x: float) -> float:
-	if x <= 0.0:
-		return 0.0
-	elif x >= 1:
-		return 1.0
-	elif x < 0.04045:
-		return x / 12.92
-	else:
-		return ((x + 0.055) / 1.055) ** 2.4
-
-def linear_from_int(rgbint):
-  return list(map (lambda y: srgb_to_linear(y/255), rgb_int2tuple(rgbint)))
-
-
-def rgb_to_hsv(r, g, b):
-    r = float(r)
-    g = float(g)
-    b = float(b)
-    high = max(r, g, b)
-    low = min(r, g, b)
-    h, s, v = high, high, high
-
-    d = high - low
-    s = 0 if high == 0 else d/high
-
-    if high == low:
-        h = 0.0
-    else:
-        h = {
-            r: (g - b) / d + (6 if g < b else 0),
-            g: (b - r) / d + 2,
-            b: (r - g) / d + 4,
-        }[high]
-        h /= 6
-
-    return h, s, v
-
-def hsv_to_rgb(h, s, v):
-    i = math.floor(h*6)
-    f = h*6 - i
-    p = v * (1-s)
-    q = v * (1-f*s)
-    t = v * (1-(1-f)*s)
-
-    r, g, b = [
-        (v, t, p),
-        (q, v, p),
-        (p, v, t),
-        (p, q, v),
-        (t, p, v),
-        (v, p, q),
-    ][int(i%6)]
-
-    return r, g, b
-#=================================================================================
-#=================================================================================
-
-def get_children(ob):
-    return [ob_child for ob_child in bpy.data.objects if ob_child.parent == ob]
-
-#Scale a 2D vector v, considering a scale s and a pivot point p
-def Scale2D( v, s, p ):
-    return ( p[0] + s[0]*(v[0] - p[0]), p[1] + s[1]*(v[1] - p[1]) )     
-
-#Scale a UV map iterating over its coordinates to a given scale and with a pivot point
-def ScaleUV( uvMap, scale, pivot ):
-    for uvIndex in range( len(uvMap.data) ):
-        uvMap.data[uvIndex].uv = Scale2D( uvMap.data[uvIndex].uv, scale, pivot )
-
-def scale_uv(obj, amountX, amountY, offsetX = 0, offsetY = 0, isDynamic = False):
-    if obj.data is None:
-        return
-
-    if len(obj.data.uv_layers) <= 0:
-        return
-
-    x_scale = amountX if amountX is not None else 1
-    y_scale = amountY if amountY is not None else 1
-
-    x_offset = offsetX if offsetX is not None else 0
-    y_offset = offsetY if offsetY is not None else 0
-    
-    # Defines the pivot and scale
-    if isDynamic:
-        pivot = Vector( (.5+x_offset, .5+y_offset) )
-    else:
-        pivot = Vector( (x_offset, y_offset) )
-
-    scale = Vector( (x_scale, y_scale) )
-
-    # Handle to UV map
-    uvMap = obj.data.uv_layers[0]
-
-    if obj is not None:
-        ScaleUV( uvMap, scale, pivot )
-
-
-# Flip our y axis on all our UVs
-def flip_uvs_y(obj):
-    if obj.data is None:
-        return
-    min_uv_y = None
-    max_uv_y = None
-    for layer in obj.data.uv_layers:
-        for loop in layer.data.values():
-            if not min_uv_y:
-                min_uv_y = loop.uv[1]
-            elif loop.uv[1] < min_uv_y:
-                min_uv_y = loop.uv[1]
-
-            if not max_uv_y:
-                max_uv_y = loop.uv[1]
-            elif loop.uv[1] > max_uv_y:
-                max_uv_y = loop.uv[1]
-
-            loop.uv[1] *= -1
-
-    if min_uv_y is None or max_uv_y is None:
-        return
-    height = max_uv_y - min_uv_y
-
-    for loop in layer.data.values():
-            loop.uv[1] += height + min_uv_y
-
-
-def load_image(url, width = None, height = None, isHDRI = False):
-    img = None
-    is_in_cache = False
-
-    # Hash URL
-    encoded = url.encode()
-    result = hashlib.sha256(encoded)
-
-    # Make a temp filename that is valid
-    tmp_filename = "./" + CACHE_PATH + "/"+ result.hexdigest()
-    if isHDRI:
-        tmp_filename += ".pic"
-    else:
-        tmp_filename += ".png"
-
-    print(tmp_filename)
-
-    # Checks if image is in cache
-    if os.path.exists(os.path.abspath(tmp_filename)):
-        is_in_cache = True
-
-    # Load image file from url.    
-    try:
-        # Fetch the image if not in cache
-        if not is_in_cache:
-            request.urlretrieve(url, os.path.abspath(tmp_filename))
-
-        # Create a blender datablock of it
-        img = bpy.data.images.load(os.path.abspath(tmp_filename))
-
-        # scale image accorting to WxH
-        if width is not None and height is not None:
-            img.scale(width,height)
-
-        # Pack the image in the blender file
-        img.pack()
-
-    except Exception as e:
-        raise NameError("Cannot load image: {0}".format(e))
-
-    return img
-
-def load_glb(url):
-    glb = None
-    is_in_cache = False
-
-    # Hash URL
-    encoded = url.encode()
-    result = hashlib.sha256(encoded)
-
-    # Make a temp filename that is valid
-    tmp_filename = "./" + CACHE_PATH + "/"+ result.hexdigest() + ".glb"
-
-    print(tmp_filename)
-
-    # Checks if image is in cache
-    if os.path.exists(os.path.abspath(tmp_filename)):
-        is_in_cache = True
-
-    try:
-        # Fetch the file if not in cache
-        if not is_in_cache:
-            request.urlretrieve(url, os.path.abspath(tmp_filename))
-
-        # Import glb file
-        bpy.ops.import_scene.gltf(filepath=os.path.abspath(tmp_filename))
-
-        # Handle to active object
-        glb = bpy.context.view_layer.objects.active
-
-    except Exception as e:
-        raise NameError("Cannot load file: {0}".format(e))
-
-    return glb
-
-def create_glb(shape):
-    glb = None
-    # Make a temp filename that is valid
-    tmp_filename = "./" + CACHE_PATH + "/"+ shape + ".glb"
-
-    path = os.path.abspath(tmp_filename)
-
-    # Import glb file
-    bpy.ops.import_scene.gltf(filepath=path)
-
-    # Handle to active object
-    glb = bpy.context.view_layer.objects.active
-
-    flip_uvs_y(glb)
-
-    return glb
-
-"""Creates Light from data in json"""
-def create_light(data):
-    # Create light datablock
-    light_data = bpy.data.lights.new(name="light-data", type='POINT')
-
-    # Set light intensity
-    light_data.energy = data['object']['intensity']*100000
-
-    # Set light radius
-    light_data.shadow_soft_size = 7
-
-    # Create color RGB list from hex value 
-    color = linear_from_int(data['object']['color'])
-
-    # Set color
-    light_data.color = color
-
-    # Create new object, pass the light data 
-    light_object = bpy.data.objects.new(name=data['object']['name'], object_data=light_data)
-
-    # Link object to collection in context
-    bpy.context.collection.objects.link(light_object)
-
-    # Change light position
-    light_object.location.x = data['position']['x']
-    light_object.location.y = -data['position']['z']
-    light_object.location.z = data['position']['y']
-
-"""Creates Camera object from data in json"""
-def create_camera(data):
-    name = "Camera"
-
-    # Create Camera
-    camera_data = bpy.data.cameras.new(name=name)
-    camera_object = bpy.data.objects.new(name, camera_data)
-    bpy.context.scene.collection.objects.link(camera_object)
-
-    # Handle to camera
-    camera = bpy.data.objects[name]
-
-    # Sets active camera
-    bpy.context.scene.camera = camera
-
-    # Set location
-    camera.location.x = data['position']['x']
-    camera.location.y = -data['position']['z']
-    camera.location.z = data['position']['y']
-
-    # Set rotation mode
-    camera.rotation_mode = 'ZYX'
-
-    # Set rotation
-    camera.rotation_euler[0] = math.radians(90)
-    camera.rotation_euler[0] += data['rotation']['_x']
-    camera.rotation_euler[1] += data['rotation']['_y']
-    camera.rotation_euler[2] += data['rotation']['_z']
-
-    # Set FOV
-    camera.data.lens_unit = 'FOV'
-    camera.data.angle = math.radians(data['object']['fov']) 
-
-    # Sets focus distance
-    camera.data.dof.use_dof = True 
-    camera.data.dof.focus_distance = data['object']['focus'] 
-
-
-"""Imports hdri file and sets it as background"""
-def import_hdri(url):
-    # Get the environment node tree of the current scene
-    node_tree = bpy.context.scene.world.node_tree
-    tree_nodes = node_tree.nodes
-
-    # Clear all nodes
-    tree_nodes.clear()
-
-    # Add Background node
-    node_background = tree_nodes.new(type='ShaderNodeBackground')
-
-    node_background.inputs["Strength"].default_value = 1
-
-    # Add Environment Texture node
-    node_environment = tree_nodes.new('ShaderNodeTexEnvironment')
+from pbr_importer.cache import AssetCache
+from pbr_importer.downloader import Downloader
+from pbr_importer.batch import expand_inputs, is_batch, write_report, REPORT_FILENAME
+from pbr_importer.lod import TEXTURE_SIZES, AUTO
+from pbr_importer.trace import tracer, write_trace, TRACE_FORMATS
+from pbr_importer.snapshot import SnapshotCache
 
-    # Load and assign the image to the node property
-    node_environment.image = load_image(url, isHDRI=True) # Relative path
-
-    # Add Output node
-    node_output = tree_nodes.new(type='ShaderNodeOutputWorld')   
-
-    # Link all nodes
-    links = node_tree.links
-    links.new(node_environment.outputs["Color"], node_background.inputs["Color"])
-    links.new(node_background.outputs["Background"], node_output.inputs["Surface"])
-
-
-"""Creates a plane which represents the floor"""
-def create_floor(data):
-    # Create plane
-    bpy.ops.mesh.primitive_plane_add(size = 200)
-
-    # Handle to floor
-    floor = bpy.context.view_layer.objects.active
-
-    # Set floor name
-    if 'name' in data:
-        floor.name = data['name']
-
-    # Create material
-    if 'files' in data:
-        create_material(data['files'], floor, texture_size, data['materialProps'])
-
-    scale_uv(floor, 6, 6)
-    
-"""Sets object material and transform properties"""
-def set_obj_props(data, obj, isDynamic = False):
-    # Create Material
-    if not isDynamic:
-        if 'files' in data['materialData']:
-            create_material(data['materialData']['files'], obj, 'medium', data['materialData']['materialProps'])
-        else:
-            create_material(None, obj, 'medium', data['materialData']['materialProps'])
-
-    # Handle to Texture Repeat value
-    texture_repeat = None
-    if 'textureRepeat' in data['materialData']['materialProps']:
-        texture_repeat = data['materialData']['materialProps']['textureRepeat']
-
-    # Apply scaling to UVs
-    if texture_repeat is not None:
-        scale_uv(obj, texture_repeat, texture_repeat)
-
-
-    # Set location
-    obj.location.x = data['position'][0]
-    obj.location.y = -data['position'][2]
-    obj.location.z = data['position'][1]
-
-    # Sets rotation mode to YZX
-    obj.rotation_mode = 'YZX'
-
-    # Set Rotation
-    obj.rotation_euler[0] = data['rotation'][0]
-    obj.rotation_euler[1] = -data['rotation'][2]
-    obj.rotation_euler[2] = data['rotation'][1]
-
-    # Set scale
-    obj.scale.x = data['scale'][0]
-    obj.scale.y = data['scale'][2]
-    obj.scale.z = data['scale'][1]
-
-
-"""Import glb object with properties from json"""
-def import_glb(data):
-    obj = load_glb(data['files'][mesh_size])
-
-    # Sets object name
-    obj.name = data['name']
-
-    # Flip UVs on y axis
-    if len(data['materialData']['materialProps']) > 0:
-        flip_uvs_y(obj)
-
-    # Sets all properties for object
-    set_obj_props(data, obj)
-
-"""Import dynamic glb object with properties from json"""
-def import_dynamic_glb(data):
-    obj = load_glb(data['files']['medium'])
-
-    image = None
-
-    # get dynamic image object
-    if obj.name.startswith("dynamic_image"):
-        image = obj
-    else:
-        for i in bpy.data.objects:
-            if i.name.startswith("dynamic_image") and i.parent == obj:
-                image = i
-
-    # Sets all properties for object
-    set_obj_props(data, obj, isDynamic=True)
-    
-    # Creates material for dynamic images
-    if image is not None:
-        create_dynamic_image_material(image, data['dynamicMaterialProps'])
-
-"""Create sphere object with properties from json"""
-def create_sphere(data):
-    sphere = create_glb(shape="sphere")
-
-    # Add solifify modifier
-    bpy.ops.object.modifier_add(type='SOLIDIFY')
-
-    # Sets all properties for object
-    set_obj_props(data, sphere)
-
-"""Create cube object with properties from json"""
-def create_cube(data):
-    cube = create_glb(shape="cube")
-
-    # Add solifify modifier
-    bpy.ops.object.modifier_add(type='SOLIDIFY')
-
-    # Sets all properties for object
-    set_obj_props(data, cube)
-
-"""Create plane object with properties from json"""
-def create_plane(data):
-    plane = create_glb(shape="plane")
-
-    # Add solifify modifier
-    bpy.ops.object.modifier_add(type='SOLIDIFY')
-
-    # Sets all properties for object
-    set_obj_props(data, plane)
-
-"""Create cylinder object with properties from json"""
-def create_cylinder(data):
-    cylinder = create_glb(shape="cylinder")
-
-    # Add solifify modifier
-    bpy.ops.object.modifier_add(type='SOLIDIFY')
-
-    # Sets all properties for object
-    set_obj_props(data, cylinder)
-
-
-"""Creates Material for dynamic image objects"""
-def create_dynamic_image_material(obj, props):
-    if obj.data is None:
-        return
-    if len(obj.data.materials) >= 1:
-        for i in obj.data.materials:
-            obj.data.materials.pop(index = 0)
-    mat = bpy.data.materials.new(name=obj.name) #set new material to variable
-    mat.use_nodes = True
-
-    # Clear nodes
-    if mat.node_tree:
-        mat.node_tree.links.clear()
-        mat.node_tree.nodes.clear()
-
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-    output = nodes.new(type='ShaderNodeOutputMaterial')
-
-    # Handle to shader node
-    shader = nodes.new(type='ShaderNodeBsdfPrincipled')
-
-    # Handle to color texture
-    color = nodes.new(type='ShaderNodeTexImage')
-    color.image = load_image(props['files'], width=props['width'], height=props['height'])
-
-    # Color
-    if color is not None and color.image is not None:
-        links.new(color.outputs["Color"], shader.inputs["Base Color"] )
-
-    links.new(shader.outputs["BSDF"], output.inputs["Surface"])
-
-    #==================================================================
-    obj.data.materials.append(mat) #add the material to the object
-
-    # Apply scaling to UVs
-    if props['repeat'] is not None:
-        scale_uv(obj, props['repeat']['x'] , props['repeat']['y'], offsetX = props['offset']['x'], offsetY= props['offset']['y'], isDynamic=True )
-
-"""Creates Principled BSDF Material and assigns textures from json"""
-def create_material(files, obj, size, materialProps):
-    if obj.data is None:
-        return
-    if len(obj.data.materials) >= 1:
-        obj.data.materials.pop(index = 0)
-    mat = bpy.data.materials.new(name=obj.name) #set new material to variable
-    mat.use_nodes = True
-    rgb = None
-
-    # Clear nodes
-    if mat.node_tree:
-        mat.node_tree.links.clear()
-        mat.node_tree.nodes.clear()
-
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-    output = nodes.new(type='ShaderNodeOutputMaterial')
-
-    # Handle to shader node
-    shader = nodes.new(type='ShaderNodeBsdfPrincipled')
-
-    # Handle to normal map node
-    normal_map = nodes.new(type='ShaderNodeNormalMap')
-
-    # Handle to displacement node
-    displacement_map = nodes.new(type='ShaderNodeDisplacement')
-
-
-    # Assign material props
-    if 'clearcoat' in materialProps:
-        shader.inputs['Clearcoat'].default_value = materialProps['clearcoat']
-    if 'clearcoatRoughness' in materialProps:
-        shader.inputs['Clearcoat Roughness'].default_value = materialProps['clearcoatRoughness']
-    if 'ior' in materialProps:
-        shader.inputs['IOR'].default_value = materialProps['ior']
-    if 'metalness' in materialProps:
-        shader.inputs['Metallic'].default_value = materialProps['metalness']
-    if 'transmission' in materialProps:
-        shader.inputs['Transmission'].default_value = materialProps['transmission']
-    if 'sheen' in materialProps:
-        shader.inputs['Sheen'].default_value = materialProps['sheen']
-    if 'emissive' in materialProps:
-        if not type(materialProps['emissive']) == str:
-            shader.inputs['Emission'].default_value = (*linear_from_int(materialProps['emissive']), 1)
-
-    # Initialize texture variables
-    color = None
-    displacement = None
-    normal = None
-    roughness = None
-
-    # Handle to color texture
-    color = nodes.new(type='ShaderNodeTexImage')
-    if files is not None and size+'_color' in files:
-        color.image = load_image(files[size+'_color'])
-
-    # Handle to displacement texture
-    displacement = nodes.new(type='ShaderNodeTexImage')
-    if files is not None and size+'_displacement' in files:
-        displacement.image = load_image(files[size+'_displacement'])
-        if 'displacementScale' in materialProps:
-            displacement_map.inputs["Scale"].default_value = materialProps['displacementScale']
-
-    # Handle to normal texture
-    normal = nodes.new(type='ShaderNodeTexImage')
-    if files is not None and size+'_normal' in files:
-        normal.image = load_image(files[size+'_normal'])
-        normal.image.colorspace_settings.name = 'Non-Color'
-
-    # Handle to roughness texture
-    roughness = nodes.new(type='ShaderNodeTexImage')
-    if files is not None and size+'_roughness' in files:
-        roughness.image = load_image(files[size+'_roughness'])
-        roughness.image.colorspace_settings.name = 'Non-Color'
-
-    # Handle to MixRGB Node
-    mix_rgb = nodes.new(type='ShaderNodeMixRGB')
-    mix_rgb.blend_type = 'MULTIPLY'
-    if 'color' in materialProps and not type(materialProps['color']) == str:
-        rgb = (*linear_from_int(materialProps['color']), 1)
-        mix_rgb.inputs[2].default_value = rgb
-        mix_rgb.inputs[0].default_value = 1
-
-    #================================================================
-    # Links
-    #================================================================
-
-    # Color
-    if color is not None and color.image is not None:
-        links.new(color.outputs["Color"], mix_rgb.inputs[1])
-        links.new(mix_rgb.outputs["Color"], shader.inputs["Base Color"] )
-    elif rgb is not None:
-        transmission = shader.inputs['Transmission'].default_value
-        h,s,v = rgb_to_hsv(*linear_from_int(materialProps['color']))
-        v_range = float(1.0-v)
-        v = v + (transmission*v_range)
-        s_threshold = 0.25
-        if s >= s_threshold:
-            s_range = s-s_threshold
-            s = s - (transmission*s_range)
-        rgb = (*hsv_to_rgb(h,s,v), 1)
-        shader.inputs["Base Color"].default_value = rgb
-
-    # Normal
-    if normal is not None and normal.image is not None:    
-        links.new(normal.outputs["Color"], normal_map.inputs["Color"])
-        links.new(normal_map.outputs["Normal"], shader.inputs["Normal"])
-
-    # Roughness
-    if roughness is not None and roughness.image is not None:
-        links.new(roughness.outputs["Color"], shader.inputs["Roughness"])
-    elif 'roughness' in materialProps:
-        shader.inputs['Roughness'].default_value = materialProps['roughness']
-
-    # Displacement
-    if displacement is not None and displacement.image is not None:
-        links.new(displacement.outputs["Color"], displacement_map.inputs["Height"])
-        links.new(displacement_map.outputs["Displacement"], output.inputs["Displacement"])
-
-    links.new(shader.outputs["BSDF"], output.inputs["Surface"])
-
-    #==================================================================
-
-    obj.data.materials.append(mat) #add the material to the object
-
-
-"""Load and return json file"""
-def load_data(path):
-    file = open(path, mode='r')
-    data = file.read()
-    file.close()
-
-    return json.loads(data)
-
-"""Renders scene to specified filepath"""
-def render(output_dir, output_filename = 'render.jpg'):  
-    bpy.context.scene.render.filepath = os.path.join(os.path.abspath(output_dir), output_filename)
-    bpy.ops.render.render(write_still = True)
+# Default cache folder
+CACHE_PATH = "cache"
 
-def set_render_settings():
-    scene = bpy.context.scene
-    scene.render.engine = 'CYCLES'
-    scene.cycles.device = 'GPU'
-    scene.cycles.samples = samples
-    scene.render.resolution_x = width
-    scene.render.resolution_y = height
+# Folder of the <shape>.glb primitives next to this script, read whatever --cache_dir is
+PRIMITIVES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_PATH)
 
 def _get_argv_after_doubledash():
     """
@@ -689,66 +77,125 @@ def main():
     parser.add_argument('--height', help="render height", type= int, default= 1000)
     parser.add_argument('--width', help="render width", type= int, default= 1000)
     parser.add_argument('--samples', help="render samples", type= int, default= 3)
-    parser.add_argument('--texture_size', help="texture size", type= str,  default='large')
+    parser.add_argument('--texture_size', help="texture size: " + ", ".join(name for name, pixels in TEXTURE_SIZES) + " or " + AUTO + " to pick per material from the render size", type= str,  default='large')
+    parser.add_argument('--texture_budget', help="decoded texture memory budget in bytes with --texture_size auto", type= int, default= None)
     parser.add_argument('--mesh_size', help="mesh size", type= str,  default='gltf_original')
+    parser.add_argument('--prefetch_workers', help="parallel asset downloads", type= int, default= 8)
+    parser.add_argument('--preprocess_workers', help="processes preparing textures, 0 disables, defaults to the cores", type= int, default= None)
+    parser.add_argument('--cache_dir', '--cache-dir', help="asset cache directory", type= str, default= CACHE_PATH)
+    parser.add_argument('--cache_max_bytes', '--cache-max-bytes', help="asset cache size budget in bytes", type= int, default= None)
+    parser.add_argument('--cache_ttl', '--cache-ttl', help="seconds before cached assets are revalidated", type= int, default= 86400)
+    parser.add_argument('--offline', help="only use cached assets", action='store_true')
+    parser.add_argument('--download_retries', help="retries of failed asset downloads", type= int, default= 3)
+    parser.add_argument('--insecure', help="do not verify TLS certificates", action='store_true')
+    parser.add_argument('--threads', help="render threads, 0 uses all cores", type= int, default= 0)
+    parser.add_argument('--report', help="batch status report path", type= str, default= None)
+    parser.add_argument('--trace', help="comma separated trace formats written per scene: " + ", ".join(TRACE_FORMATS), type= str, default= '')
+    parser.add_argument('--snapshot_dir', help="folder of built scene snapshots, disabled when not set", type= str, default= None)
+    parser.add_argument('--snapshot_max_bytes', help="snapshot folder size budget in bytes", type= int, default= None)
+    parser.add_argument('--rebuild', help="ignore and replace existing snapshots", action='store_true')
+    parser.add_argument('--dry-run', '--dry_run', dest='dry_run', help="print the build plan as json without rendering", action='store_true')
+    parser.add_argument('--probe', help="with --dry-run, request the size of uncached assets", action='store_true')
 
     # parse arguments
     args = parser.parse_args(args=_get_argv_after_doubledash())
 
-    # assign arguments to global variables
-    global input_dir
-    global output_dir
-    global height
-    global width
-    global samples
-    global texture_size
-    global mesh_size
-    input_dir = args.input
-    output_dir = args.output
-    height = args.height
-    width = args.width
-    samples = args.samples
-    texture_size = args.texture_size
-    mesh_size = args.mesh_size
-
-    ssl._create_default_https_context = ssl._create_unverified_context
-
-    json = load_data(input_dir)
-
-    # Remove all objects
-    for obj in bpy.data.objects:
-        bpy.data.objects.remove(obj)
-
-    # Create camera
-    create_camera(json['camera'])
-
-    # Create light
-    create_light(json['light'])
-
-    # Import HDRI image as enviroment
-    import_hdri(json['environment'])
-
-    # Create floor
-    create_floor(json['floor'])
-
-    # Import all objects
-    for i in json['objects']:
-        if i['name'] == "Sphere":
-            create_sphere(i)
-        if i['name'] == "Cube":
-            create_cube(i)
-        if i['name'] == "Plane":
-            create_plane(i)
-        if i['name'] == "Cylinder":
-            create_cylinder(i)
-        if i['type'] == "gltf":
-            import_glb(i)
-        if i['type'] == "dynamic":
-            import_dynamic_glb(i)
+    # The bpy builders are only imported to render, the dry run and --help never load Blender modules
+    builders = None
+    if not args.dry_run:
+        try:
+            from pbr_importer import builders
+        except ImportError as e:
+            parser.error("{0}, run through blender --background --python pbr_import.py -- or use --dry-run".format(e))
+
+    # Certificates are only skipped for asset downloads, and only when asked to
+    ssl_context = ssl._create_unverified_context() if args.insecure else None
+    downloader = Downloader(retries=args.download_retries, ssl_context=ssl_context)
+
+    asset_cache = AssetCache(args.cache_dir, max_bytes=args.cache_max_bytes, ttl=args.cache_ttl, offline=args.offline, downloader=downloader)
+
+    trace_formats = [name for name in args.trace.split(',') if name]
+    for name in trace_formats:
+        if name not in TRACE_FORMATS:
+            parser.error("unknown trace format {0}".format(name))
+    tracer.enabled = True
+
+    jobs = expand_inputs(args.input)
+    results = []
+
+    # Print what every scene needs and stop before anything is built
+    if args.dry_run:
+        from pbr_importer.plan import build_plan
+        from pbr_importer.stream import load_scene
+
+        for scene_path, output_filename in jobs:
+            try:
+                plan = build_plan(load_scene(scene_path, args.mesh_size), asset_cache, args.texture_size, args.mesh_size, render_size=(args.width, args.height), texture_budget=args.texture_budget, probe=args.probe, max_workers=args.prefetch_workers)
+                plan.update(input=scene_path, output=os.path.join(os.path.abspath(args.output), output_filename), status='ok')
+            except Exception as e:
+                plan = {'input': scene_path, 'status': 'failed', 'error': str(e)}
+            results.append(plan)
+
+        print(json.dumps(results if is_batch(args.input) else results[0], indent=2))
+        asset_cache.close()
+        downloader.close()
+        if any(result['status'] != 'ok' for result in results):
+            sys.exit(1)
+        return
 
-    set_render_settings()
-    
-    render(output_dir = output_dir)
+    snapshot_cache = None
+    if args.snapshot_dir is not None:
+        snapshot_cache = SnapshotCache(args.snapshot_dir, max_bytes=args.snapshot_max_bytes)
+
+    builders.configure(args, asset_cache, snapshot_cache, PRIMITIVES_PATH)
+
+    report_path = args.report
+    if report_path is None and is_batch(args.input):
+        report_path = os.path.join(os.path.abspath(args.output), REPORT_FILENAME)
+
+    for scene_path, output_filename in jobs:
+        start = time.time()
+        tracer.reset()
+        try:
+            # The files of the scene stay in the cache until it is rendered
+            with asset_cache.job():
+                builders.render_scene(scene_path, output_filename, args.prefetch_workers)
+            status, error = 'ok', None
+        except Exception as e:
+            traceback.print_exc()
+            status, error = 'failed', str(e)
+
+        results.append({
+            'input': scene_path,
+            'output': os.path.join(os.path.abspath(args.output), output_filename),
+            'status': status,
+            'error': error,
+            'seconds': round(time.time() - start, 3),
+            'stages': dict((name, round(stage['seconds'], 3)) for name, stage in tracer.stages().items()),
+            'counters': dict(tracer.counters),
+        })
+        print("{0}: {1} ({2}s)".format(scene_path, status, results[-1]['seconds']))
+
+        # Per scene trace next to the render, e.g. render.trace.json
+        trace_base = os.path.join(os.path.abspath(args.output), os.path.splitext(output_filename)[0])
+        for path in write_trace(tracer, trace_base, trace_formats):
+            print("Trace written to {0}".format(path))
+
+        # Written after every job so a crash only loses the scene being rendered
+        if report_path is not None:
+            write_report(report_path, results)
+
+    asset_cache.close()
+    downloader.close()
+    if snapshot_cache is not None:
+        snapshot_cache.close()
+
+    # Report size and latency of every download
+    for line in downloader.report():
+        print(line)
+
+    if any(result['status'] != 'ok' for result in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
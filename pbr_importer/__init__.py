@@ -1,7 +1,3 @@
-from . import panel
-from . import import_json_ot
-from . import create_scene_op
-
 bl_info = {
     "name": "glTF PBR Importer",
     "blender": (3, 0, 0),
@@ -9,12 +5,23 @@ bl_info = {
     "support": "COMMUNITY",
 }
 
+# The UI modules need bpy, they are imported on registration so the cache,
+# prefetch and farm modules can be used outside of Blender
+
 def register():
+    from . import panel
+    from . import import_json_ot
+    from . import create_scene_op
+
     panel.register()
     import_json_ot.register()
     create_scene_op.register()
 
 def unregister():
+    from . import panel
+    from . import import_json_ot
+    from . import create_scene_op
+
     panel.unregister()
     import_json_ot.unregister()
-    create_scene_op.unregister
\ No newline at end of file
+    create_scene_op.unregister()
@@ -0,0 +1,92 @@
+import os
+import glob
+import json
+
+
+# Output file name used when a single scene file is rendered
+DEFAULT_OUTPUT = 'render.jpg'
+
+# Name of the per-job status report written next to batch renders
+REPORT_FILENAME = 'report.json'
+
+"""Returns True when input names more than one scene"""
+def is_batch(input):
+    return os.path.isdir(input) or input.endswith('.jsonl') or glob.has_magic(input)
+
+"""Returns the list of (scene path, output filename) jobs described by input
+
+input can be a scene file, a directory of scene files, a glob pattern or a
+JSONL manifest whose lines are either a scene path or an object with an
+"input" path and an optional "output" file name.
+"""
+def expand_inputs(input):
+    if os.path.isdir(input):
+        paths = sorted(glob.glob(os.path.join(input, '*.json')))
+    elif input.endswith('.jsonl'):
+        return read_manifest(input)
+    elif glob.has_magic(input):
+        paths = sorted(glob.glob(input))
+    else:
+        return [(input, DEFAULT_OUTPUT)]
+
+    jobs = []
+    used = set()
+    for path in paths:
+        jobs.append((path, _unique_output(_output_name(path), used)))
+
+    return jobs
+
+"""Reads a JSONL manifest, relative paths are resolved against its folder"""
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    used = set()
+
+    with open(path, mode='r') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {'input': entry}
+            if not isinstance(entry, dict) or 'input' not in entry:
+                raise ValueError("{0}:{1}: manifest entries need an input path".format(path, line_number))
+
+            scene_path = os.path.join(base, entry['input'])
+            output = entry.get('output') or _output_name(scene_path)
+            jobs.append((scene_path, _unique_output(output, used)))
+
+    return jobs
+
+def _output_name(path):
+    return os.path.splitext(os.path.basename(path))[0] + '.jpg'
+
+def _unique_output(name, used):
+    stem, ext = os.path.splitext(name)
+    candidate = name
+    n = 1
+    while candidate in used:
+        candidate = "{0}-{1}{2}".format(stem, n, ext)
+        n += 1
+    used.add(candidate)
+    return candidate
+
+"""Writes the per-job status report as json, replacing the previous one atomically"""
+def write_report(path, results):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w') as file:
+        json.dump({
+            'jobs': results,
+            'succeeded': sum(1 for result in results if result['status'] == 'ok'),
+            'failed': sum(1 for result in results if result['status'] != 'ok'),
+        }, file, indent=2)
+    os.replace(tmp_path, path)
+
+"""Reads a report written by write_report, returns its jobs or an empty list"""
+def read_report(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, mode='r') as file:
+        return json.load(file)['jobs']
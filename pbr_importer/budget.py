@@ -0,0 +1,183 @@
+import math
+import heapq
+
+from . lod import TEXTURE_MAPS, TEXTURE_SIZES, available_sizes, texture_key
+from . prefetch import PRIMITIVES
+
+
+# Object key holding the planned size of each texture map, read by the builders
+PLAN_KEY = 'textureSizes'
+
+# Largest side in metres of each primitive at scale 1, see primitives.add_shape
+PRIMITIVE_EXTENTS = {'Sphere': 9.0, 'Cube': 6.0, 'Plane': 4.0, 'Cylinder': 12.0}
+
+# Size in metres assumed for glb models at scale 1, larger than most so their textures are not undersized
+GLB_EXTENT = 3.0
+
+# Share of the projected size each map needs, detail in these maps is less visible
+MAP_DETAIL = {'color': 1.0, 'normal': 1.0, 'roughness': 0.5, 'displacement': 0.5}
+
+# Bytes per texel of a decoded 8 bit RGBA texture
+BYTES_PER_PIXEL = 4
+
+def _rotation_zyx(x, y, z):
+    # Matrix of a Blender 'ZYX' euler: Z is applied first, then Y, then X
+    cx, sx = math.cos(x), math.sin(x)
+    cy, sy = math.cos(y), math.sin(y)
+    cz, sz = math.cos(z), math.sin(z)
+    rx = ((1, 0, 0), (0, cx, -sx), (0, sx, cx))
+    ry = ((cy, 0, sy), (0, 1, 0), (-sy, 0, cy))
+    rz = ((cz, -sz, 0), (sz, cz, 0), (0, 0, 1))
+    return _mul(rx, _mul(ry, rz))
+
+def _mul(a, b):
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+
+def _apply(m, v):
+    return tuple(sum(m[i][k] * v[k] for k in range(3)) for i in range(3))
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+"""Returns the camera create_camera builds as (position, right, up, forward, tan of half the fov)"""
+def camera_view(camera):
+    position = (camera['position']['x'], -camera['position']['z'], camera['position']['y'])
+    rotation = _rotation_zyx(math.radians(90) + camera['rotation']['_x'], camera['rotation']['_y'], camera['rotation']['_z'])
+
+    # Blender cameras look down their local -Z axis with Y up
+    right = _apply(rotation, (1, 0, 0))
+    up = _apply(rotation, (0, 1, 0))
+    forward = _apply(rotation, (0, 0, -1))
+
+    return position, right, up, forward, math.tan(math.radians(camera['object']['fov']) / 2)
+
+"""Returns the pixels spanned on screen by an object of extent metres, 0 when it is out of view
+
+The fov spans the longer side of the render, like a Blender camera with
+automatic sensor fit.
+"""
+def projected_pixels(view, position, extent, width, height):
+    origin, right, up, forward, tan_half = view
+    offset = tuple(position[i] - origin[i] for i in range(3))
+    radius = extent / 2
+
+    depth = _dot(offset, forward)
+    if depth + radius <= 0:
+        return 0
+
+    # Half the frustum at the object depth, on each screen axis
+    longer = max(width, height)
+    half_x = depth * tan_half * width / longer
+    half_y = depth * tan_half * height / longer
+    if abs(_dot(offset, right)) - radius > half_x or abs(_dot(offset, up)) - radius > half_y:
+        return 0
+
+    # Objects around the camera plane fill the frame
+    if depth <= radius:
+        return longer
+
+    return min(longer, extent / (2 * depth * tan_half) * longer)
+
+def _object_position(obj):
+    return (obj['position'][0], -obj['position'][2], obj['position'][1])
+
+def _object_extent(obj):
+    return PRIMITIVE_EXTENTS.get(obj['name'], GLB_EXTENT) * max(abs(value) for value in obj['scale'])
+
+def _texture_repeat(obj):
+    repeat = obj['materialData']['materialProps'].get('textureRepeat')
+    return repeat if repeat is not None and repeat > 1 else 1
+
+"""Chooses the size of each texture map of every object and stores it under PLAN_KEY
+
+Textures are sized to the pixels their object covers through the scene
+camera, divided by the texture repeat. Textures shared by several objects
+get the size the largest of them needs. When budget_bytes is given the
+textures whose smaller variant still comes closest to the pixels they
+need are stepped down one size at a time until the decoded textures fit.
+Objects that already have PLAN_KEY in the json keep it.
+
+Returns a summary with the bytes planned and the count of maps per size.
+"""
+def plan_texture_sizes(data, width, height, budget_bytes=None, max_size=None):
+    pixels = dict(TEXTURE_SIZES)
+    names = [name for name, size in TEXTURE_SIZES]
+    if max_size in pixels:
+        names = names[:names.index(max_size) + 1]
+
+    view = camera_view(data['camera']) if 'camera' in data else None
+    longer = max(width, height)
+
+    # Textures by the urls of their variants, with the pixels their objects need
+    textures = {}
+    planned = []
+    for obj in data.get('objects', []):
+        if obj['type'] == 'dynamic' or PLAN_KEY in obj:
+            continue
+        if obj['name'] not in PRIMITIVES and obj['type'] != 'gltf':
+            continue
+
+        files = obj['materialData'].get('files')
+        sizes = [name for name in available_sizes(files) if name in names]
+        if len(sizes) == 0:
+            continue
+
+        if view is not None:
+            needed = projected_pixels(view, _object_position(obj), _object_extent(obj), width, height) / _texture_repeat(obj)
+        else:
+            needed = longer
+
+        for texture in TEXTURE_MAPS:
+            variants = [name for name in sizes if texture_key(name, texture) in files]
+            if len(variants) == 0:
+                continue
+            key = tuple(files[texture_key(name, texture)] for name in variants)
+            entry = textures.setdefault(key, {'variants': variants, 'needed': 0, 'texture': texture})
+            entry['needed'] = max(entry['needed'], needed * MAP_DETAIL[texture])
+            planned.append((obj, texture, key))
+
+    # Smallest variant covering the pixels needed
+    total = 0
+    for entry in textures.values():
+        variants = entry['variants']
+        entry['tier'] = len(variants) - 1
+        for i, name in enumerate(variants):
+            if pixels[name] >= entry['needed']:
+                entry['tier'] = i
+                break
+        total += _texture_bytes(pixels[variants[entry['tier']]])
+
+    # Step down the textures losing the least detail until the budget is met
+    if budget_bytes is not None:
+        heap = []
+        for key, entry in textures.items():
+            _push_step(heap, key, entry, pixels)
+        while total > budget_bytes and len(heap) > 0:
+            loss, key = heapq.heappop(heap)
+            entry = textures[key]
+            variants = entry['variants']
+            total -= _texture_bytes(pixels[variants[entry['tier']]]) - _texture_bytes(pixels[variants[entry['tier'] - 1]])
+            entry['tier'] -= 1
+            _push_step(heap, key, entry, pixels)
+
+    for obj, texture, key in planned:
+        entry = textures[key]
+        obj.setdefault(PLAN_KEY, {})[texture] = entry['variants'][entry['tier']]
+
+    counts = {}
+    for entry in textures.values():
+        name = entry['variants'][entry['tier']]
+        counts[name] = counts.get(name, 0) + 1
+
+    return {'bytes': total, 'textures': counts, 'over_budget': budget_bytes is not None and total > budget_bytes}
+
+def _texture_bytes(side):
+    return side * side * BYTES_PER_PIXEL
+
+def _push_step(heap, key, entry, pixels):
+    # Detail kept by the next smaller variant, the most kept goes first
+    if entry['tier'] == 0:
+        return
+    smaller = pixels[entry['variants'][entry['tier'] - 1]]
+    kept = smaller / entry['needed'] if entry['needed'] > 0 else float('inf')
+    heapq.heappush(heap, (-kept, key))
@@ -0,0 +1,880 @@
+import os
+import sys
+import math
+import bpy
+from mathutils import Matrix, Vector
+
+from . prefetch import collect_assets, prefetch_scene
+from . incremental import update_scene
+from . signatures import material_signature, dynamic_material_signature, mesh_signature
+from . uv import scale_layer, flip_layers_y
+from . stream import load_scene
+from . lod import select_texture_size, texture_key, AUTO
+from . budget import plan_texture_sizes
+from . preprocess import collect_images, preprocess_images, can_preprocess
+from . resize import fetch_resized, can_resize
+from . trace import tracer, traced
+from . colors import linear_from_int, rgb_to_hsv, hsv_to_rgb
+from . node_groups import get_pbr_group
+from . import node_groups
+from . scene_diff import scene_state
+from . snapshot import snapshot_options, snapshot_key
+from . library import load_from_library
+from . primitives import add_plane, add_solidify, add_shape
+from . cache import file_sha256
+from . hierarchy import HierarchyIndex, DYNAMIC_IMAGE_PREFIX
+
+
+# Asset cache shared by the loaders, set by configure()
+asset_cache = None
+
+# Folder of the <shape>.glb primitives, set by configure(), never managed by the asset cache
+# None builds the primitive meshes in Blender instead
+primitives_path = None
+
+# Built scenes saved as .blend files, see pbr_importer.snapshot, None when disabled
+snapshot_cache = None
+
+# Build scenes even when a snapshot of them exists, replacing it
+rebuild = False
+
+# Files prepared outside Blender by load_image key, see preprocess.preprocess_images
+prepared_images = {}
+
+# Images loaded by load_image by (url, width, height, colour space), kept across the scenes of a batch
+loaded_images = {}
+
+# Cache file each image of loaded_images was read from, Blender reads it again when rendering
+image_files = {}
+
+# Image loads of the current scene: requested, reused from loaded_images and read from disk
+image_stats = {'requests': 0, 'reused': 0, 'loaded': 0}
+
+# Materials by signature, identical materials are built once and shared
+loaded_materials = {}
+
+# Imported glb hierarchies by mesh signature, later uses become linked duplicates
+loaded_meshes = {}
+
+# Children of the objects added by glb imports and duplicates, looked up without scanning bpy.data.objects
+hierarchy = HierarchyIndex()
+
+# State index of the scene currently built, see pbr_importer.incremental
+built_state = {}
+
+
+"""Sets the render options parsed by pbr_import.py, the asset cache the loaders read from and the primitives folder
+
+args may also hold an object_texture_size, the texture size of the
+objects when it differs from the floor's.
+"""
+def configure(args, cache, snapshots = None, primitives = None):
+    global asset_cache
+    global primitives_path
+    global snapshot_cache
+    global rebuild
+    global output_dir
+    global height
+    global width
+    global samples
+    global texture_size
+    global object_texture_size
+    global mesh_size
+    global threads
+    global texture_budget
+    global preprocess_workers
+    asset_cache = cache
+    primitives_path = primitives
+    snapshot_cache = snapshots
+    rebuild = args.rebuild
+    output_dir = args.output
+    height = args.height
+    width = args.width
+    samples = args.samples
+    texture_size = args.texture_size
+    object_texture_size = getattr(args, 'object_texture_size', None) or args.texture_size
+    mesh_size = args.mesh_size
+    threads = args.threads
+    texture_budget = args.texture_budget
+    preprocess_workers = args.preprocess_workers
+
+
+"""Returns False for None and for datablocks removed from bpy.data"""
+def is_valid(datablock):
+    if datablock is None:
+        return False
+    try:
+        datablock.name
+    except ReferenceError:
+        return False
+    return True
+
+def get_children(ob):
+    return hierarchy.children(ob)
+
+#Scale a UV map to a given scale and with a pivot point, all coordinates at once
+def ScaleUV( uvMap, scale, pivot ):
+    scale_layer( uvMap, scale, pivot )
+
+@traced('scale_uv')
+def scale_uv(obj, amountX, amountY, offsetX = 0, offsetY = 0, isDynamic = False):
+    if obj.data is None:
+        return
+
+    if len(obj.data.uv_layers) <= 0:
+        return
+
+    x_scale = amountX if amountX is not None else 1
+    y_scale = amountY if amountY is not None else 1
+
+    x_offset = offsetX if offsetX is not None else 0
+    y_offset = offsetY if offsetY is not None else 0
+    
+    # Defines the pivot and scale
+    if isDynamic:
+        pivot = Vector( (.5+x_offset, .5+y_offset) )
+    else:
+        pivot = Vector( (x_offset, y_offset) )
+
+    scale = Vector( (x_scale, y_scale) )
+
+    # Handle to UV map
+    uvMap = obj.data.uv_layers[0]
+
+    if obj is not None:
+        ScaleUV( uvMap, scale, pivot )
+
+
+# Flip our y axis on all our UVs
+@traced('flip_uvs_y')
+def flip_uvs_y(obj):
+    if obj.data is None:
+        return
+    flip_layers_y(obj.data.uv_layers)
+
+
+@traced('load_image')
+def load_image(url, width = None, height = None, isHDRI = False, colorspace = None):
+    img = None
+    image_stats['requests'] += 1
+
+    # Reuse the datablock of an earlier load with the same size and colour space
+    key = (url, width, height, colorspace)
+    if is_valid(loaded_images.get(key)):
+        image_stats['reused'] += 1
+        return loaded_images[key]
+
+    # Load image file from url.    
+    try:
+        ext = ".pic" if isHDRI else ".png"
+        resized = False
+
+        # Files decoded, resized and converted by the preprocessing pool are loaded as they are
+        if key in prepared_images and os.path.exists(prepared_images[key]):
+            tmp_filename = prepared_images[key]
+            resized = True
+
+        # Fetch the image if not in cache, at its final size when it can be resized outside Blender
+        elif width is not None and height is not None and can_resize():
+            try:
+                tmp_filename = fetch_resized(asset_cache, url, ext, width, height)
+                resized = True
+            except Exception as e:
+                print("Cannot resize {0}, scaling in Blender: {1}".format(url, e))
+        if not resized:
+            tmp_filename = asset_cache.fetch(url, ext)
+
+        # Create a blender datablock of it, reusing one already loaded from the file
+        with tracer.span('image_decode', url=url):
+            img = bpy.data.images.load(tmp_filename, check_existing=True)
+
+            # A datablock registered with another size or colour space must not be changed
+            if any(img == other for other in loaded_images.values() if is_valid(other)):
+                img = bpy.data.images.load(tmp_filename, check_existing=False)
+        image_stats['loaded'] += 1
+
+        # scale image accorting to WxH
+        if width is not None and height is not None and not resized:
+            with tracer.span('image_scale', url=url, width=width, height=height):
+                img.scale(width,height)
+
+        if colorspace is not None:
+            img.colorspace_settings.name = colorspace
+
+    except Exception as e:
+        raise NameError("Cannot load image: {0}".format(e))
+
+    loaded_images[key] = img
+    image_files[key] = tmp_filename
+
+    return img
+
+"""Packs the images loaded by load_image into the blend file, used before saving"""
+def pack_images():
+    for img in loaded_images.values():
+        if is_valid(img) and img.packed_file is None:
+            img.pack()
+
+"""Adds a glb to the scene and returns its root, flip flips the root UVs like flip_uvs_y
+
+The glb is parsed by the glTF importer once per content, later loads
+append it from the .blend library saved in the asset cache.
+"""
+@traced('load_glb')
+def load_glb(url, flip = False):
+    glb = None
+
+    try:
+        # Fetch the file if not in cache
+        tmp_filename = asset_cache.fetch(url, ".glb")
+        entry = asset_cache.status(url, ".glb")[1]
+
+        # Import glb file
+        glb, added = load_from_library(asset_cache, tmp_filename, entry['sha256'], flip)
+        hierarchy.add(added)
+
+    except Exception as e:
+        raise NameError("Cannot load file: {0}".format(e))
+
+    return glb
+
+"""Returns a linked duplicate of an object and its children, sharing their mesh data"""
+def duplicate_hierarchy(obj, parent = None):
+    copy = obj.copy()
+    for collection in obj.users_collection:
+        collection.objects.link(copy)
+    if parent is not None:
+        copy.parent = parent
+    hierarchy.add([copy])
+
+    for child in hierarchy.children(obj):
+        duplicate_hierarchy(child, copy)
+
+    return copy
+
+"""Imports a glb once per mesh signature, returns (object, True) for linked duplicates"""
+def load_glb_instance(url, key, flip = False):
+    source = loaded_meshes.get(key)
+    if is_valid(source):
+        return duplicate_hierarchy(source), True
+
+    glb = load_glb(url, flip)
+    loaded_meshes[key] = glb
+
+    return glb, False
+
+def create_glb(shape, key):
+    # Later primitives with the same UVs share the mesh of the first one
+    source = loaded_meshes.get(key)
+    if is_valid(source):
+        return duplicate_hierarchy(source), True
+
+    if primitives_path is None:
+        glb = add_shape(shape)
+        hierarchy.add([glb])
+    else:
+        # Primitive files ship with the script, they are not cached assets
+        path = os.path.join(primitives_path, shape + ".glb")
+
+        # Import glb file, flipped like the glb objects
+        glb, added = load_from_library(asset_cache, path, file_sha256(path), flip=True)
+        hierarchy.add(added)
+
+    loaded_meshes[key] = glb
+
+    return glb, False
+
+"""Creates Light from data in json"""
+def create_light(data):
+    # Create light datablock
+    light_data = bpy.data.lights.new(name="light-data", type='POINT')
+
+    # Set light intensity
+    light_data.energy = data['object']['intensity']*100000
+
+    # Set light radius
+    light_data.shadow_soft_size = 7
+
+    # Create color RGB list from hex value 
+    color = linear_from_int(data['object']['color'])
+
+    # Set color
+    light_data.color = color
+
+    # Create new object, pass the light data 
+    light_object = bpy.data.objects.new(name=data['object']['name'], object_data=light_data)
+
+    # Link object to collection in context
+    bpy.context.collection.objects.link(light_object)
+
+    # Change light position
+    light_object.location.x = data['position']['x']
+    light_object.location.y = -data['position']['z']
+    light_object.location.z = data['position']['y']
+
+    return light_object
+
+"""Creates Camera object from data in json"""
+def create_camera(data):
+    name = "Camera"
+
+    # Create Camera
+    camera_data = bpy.data.cameras.new(name=name)
+    camera_object = bpy.data.objects.new(name, camera_data)
+    bpy.context.scene.collection.objects.link(camera_object)
+
+    # Handle to camera
+    camera = bpy.data.objects[name]
+
+    # Sets active camera
+    bpy.context.scene.camera = camera
+
+    # Set location
+    camera.location.x = data['position']['x']
+    camera.location.y = -data['position']['z']
+    camera.location.z = data['position']['y']
+
+    # Set rotation mode
+    camera.rotation_mode = 'ZYX'
+
+    # Set rotation
+    camera.rotation_euler[0] = math.radians(90)
+    camera.rotation_euler[0] += data['rotation']['_x']
+    camera.rotation_euler[1] += data['rotation']['_y']
+    camera.rotation_euler[2] += data['rotation']['_z']
+
+    # Set FOV
+    camera.data.lens_unit = 'FOV'
+    camera.data.angle = math.radians(data['object']['fov']) 
+
+    # Sets focus distance
+    camera.data.dof.use_dof = True 
+    camera.data.dof.focus_distance = data['object']['focus'] 
+
+    return camera
+
+
+"""Imports hdri file and sets it as background"""
+def import_hdri(url):
+    # Get the environment node tree of the current scene
+    node_tree = bpy.context.scene.world.node_tree
+    tree_nodes = node_tree.nodes
+
+    # Clear all nodes
+    tree_nodes.clear()
+
+    # Add Background node
+    node_background = tree_nodes.new(type='ShaderNodeBackground')
+
+    node_background.inputs["Strength"].default_value = 1
+
+    # Add Environment Texture node
+    node_environment = tree_nodes.new('ShaderNodeTexEnvironment')
+
+    # Load and assign the image to the node property
+    node_environment.image = load_image(url, isHDRI=True) # Relative path
+
+    # Add Output node
+    node_output = tree_nodes.new(type='ShaderNodeOutputWorld')   
+
+    # Link all nodes
+    links = node_tree.links
+    links.new(node_environment.outputs["Color"], node_background.inputs["Color"])
+    links.new(node_background.outputs["Background"], node_output.inputs["Surface"])
+
+
+"""Creates a plane which represents the floor"""
+def create_floor(data):
+    # Create plane
+    floor = add_plane("Plane", 200)
+
+    # Set floor name
+    if 'name' in data:
+        floor.name = data['name']
+
+    # Create material
+    if 'files' in data:
+        create_material(data['files'], floor, texture_size_for(data['files']), data['materialProps'])
+
+    scale_uv(floor, 6, 6)
+
+    return floor
+    
+"""Sets object material and transform properties, UVs of shared meshes are already scaled"""
+def set_obj_props(data, obj, isDynamic = False, scaleUVs = True):
+    # Create Material
+    if not isDynamic:
+        files = data['materialData'].get('files')
+        create_material(files, obj, data.get('textureSizes') or texture_size_for(files, object_texture_size), data['materialData']['materialProps'])
+
+    # Handle to Texture Repeat value
+    texture_repeat = None
+    if 'textureRepeat' in data['materialData']['materialProps']:
+        texture_repeat = data['materialData']['materialProps']['textureRepeat']
+
+    # Apply scaling to UVs
+    if texture_repeat is not None and scaleUVs:
+        scale_uv(obj, texture_repeat, texture_repeat)
+
+    # Set location, rotation and scale
+    set_obj_transform(data, obj)
+
+"""Sets object transform from json"""
+def set_obj_transform(data, obj):
+    # Set location
+    obj.location.x = data['position'][0]
+    obj.location.y = -data['position'][2]
+    obj.location.z = data['position'][1]
+
+    # Sets rotation mode to YZX
+    obj.rotation_mode = 'YZX'
+
+    # Set Rotation
+    obj.rotation_euler[0] = data['rotation'][0]
+    obj.rotation_euler[1] = -data['rotation'][2]
+    obj.rotation_euler[2] = data['rotation'][1]
+
+    # Set scale
+    obj.scale.x = data['scale'][0]
+    obj.scale.y = data['scale'][2]
+    obj.scale.z = data['scale'][1]
+
+
+"""Import glb object with properties from json"""
+def import_glb(data):
+    # Flip UVs on y axis when the object has material props, the library holds the glb flipped
+    flip = len(data['materialData']['materialProps']) > 0
+    obj, is_instance = load_glb_instance(data['files'][mesh_size], mesh_signature('gltf', data, mesh_size), flip)
+
+    # Sets object name
+    obj.name = data['name']
+
+    # Sets all properties for object
+    set_obj_props(data, obj, scaleUVs=not is_instance)
+
+    return obj
+
+"""Import dynamic glb object with properties from json"""
+def import_dynamic_glb(data):
+    obj, is_instance = load_glb_instance(data['files']['medium'], mesh_signature('dynamic', data, mesh_size))
+
+    # get dynamic image object
+    if obj.name.startswith(DYNAMIC_IMAGE_PREFIX):
+        image = obj
+    else:
+        image = hierarchy.find_child(obj, DYNAMIC_IMAGE_PREFIX)
+
+    # Sets all properties for object
+    set_obj_props(data, obj, isDynamic=True, scaleUVs=not is_instance)
+    
+    # Creates material for dynamic images
+    if image is not None:
+        create_dynamic_image_material(image, data['dynamicMaterialProps'], scaleUVs=not is_instance)
+
+    return obj
+
+"""Create sphere object with properties from json"""
+def create_sphere(data):
+    sphere, is_instance = create_glb(shape="sphere", key=mesh_signature('shape', data, mesh_size))
+
+    # Add solifify modifier, linked duplicates copy it
+    if not is_instance:
+        add_solidify(sphere)
+
+    # Sets all properties for object
+    set_obj_props(data, sphere, scaleUVs=not is_instance)
+
+    return sphere
+
+"""Create cube object with properties from json"""
+def create_cube(data):
+    cube, is_instance = create_glb(shape="cube", key=mesh_signature('shape', data, mesh_size))
+
+    # Add solifify modifier, linked duplicates copy it
+    if not is_instance:
+        add_solidify(cube)
+
+    # Sets all properties for object
+    set_obj_props(data, cube, scaleUVs=not is_instance)
+
+    return cube
+
+"""Create plane object with properties from json"""
+def create_plane(data):
+    plane, is_instance = create_glb(shape="plane", key=mesh_signature('shape', data, mesh_size))
+
+    # Add solifify modifier, linked duplicates copy it
+    if not is_instance:
+        add_solidify(plane)
+
+    # Sets all properties for object
+    set_obj_props(data, plane, scaleUVs=not is_instance)
+
+    return plane
+
+"""Create cylinder object with properties from json"""
+def create_cylinder(data):
+    cylinder, is_instance = create_glb(shape="cylinder", key=mesh_signature('shape', data, mesh_size))
+
+    # Add solifify modifier, linked duplicates copy it
+    if not is_instance:
+        add_solidify(cylinder)
+
+    # Sets all properties for object
+    set_obj_props(data, cylinder, scaleUVs=not is_instance)
+
+    return cylinder
+
+
+"""Builds an object from json, returns the objects placed by its transform"""
+def build_object(data):
+    roots = []
+    if data['name'] == "Sphere":
+        roots.append(create_sphere(data))
+    if data['name'] == "Cube":
+        roots.append(create_cube(data))
+    if data['name'] == "Plane":
+        roots.append(create_plane(data))
+    if data['name'] == "Cylinder":
+        roots.append(create_cylinder(data))
+    if data['type'] == "gltf":
+        roots.append(import_glb(data))
+    if data['type'] == "dynamic":
+        roots.append(import_dynamic_glb(data))
+    return roots
+
+
+"""Creates Material for dynamic image objects"""
+@traced('create_dynamic_image_material')
+def create_dynamic_image_material(obj, props, scaleUVs = True):
+    if obj.data is None:
+        return
+
+    # Share the material of an identical one built before
+    signature = dynamic_material_signature(props)
+    mat = loaded_materials.get(signature)
+    if not is_valid(mat):
+        mat = build_dynamic_image_material(obj.name, props)
+        loaded_materials[signature] = mat
+
+    if obj.data.users > 1:
+        link_object_material(obj, mat)
+    else:
+        if len(obj.data.materials) >= 1:
+            for i in obj.data.materials:
+                obj.data.materials.pop(index = 0)
+        obj.data.materials.append(mat) #add the material to the object
+
+    # Apply scaling to UVs
+    if props['repeat'] is not None and scaleUVs:
+        scale_uv(obj, props['repeat']['x'] , props['repeat']['y'], offsetX = props['offset']['x'], offsetY= props['offset']['y'], isDynamic=True )
+
+"""Builds the node tree of a dynamic image material"""
+def build_dynamic_image_material(name, props):
+    mat = bpy.data.materials.new(name=name) #set new material to variable
+    mat.use_nodes = True
+
+    # Clear nodes
+    if mat.node_tree:
+        mat.node_tree.links.clear()
+        mat.node_tree.nodes.clear()
+
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    output = nodes.new(type='ShaderNodeOutputMaterial')
+
+    # Handle to shader node
+    shader = nodes.new(type='ShaderNodeBsdfPrincipled')
+
+    # Handle to color texture
+    color = nodes.new(type='ShaderNodeTexImage')
+    color.image = load_image(props['files'], width=props['width'], height=props['height'])
+
+    # Color
+    if color is not None and color.image is not None:
+        links.new(color.outputs["Color"], shader.inputs["Base Color"] )
+
+    links.new(shader.outputs["BSDF"], output.inputs["Surface"])
+
+    return mat
+
+"""Creates Principled BSDF Material and assigns textures from json"""
+@traced('create_material')
+def create_material(files, obj, size, materialProps):
+    if obj.data is None:
+        return
+
+    # Share the material of an identical one built before
+    signature = material_signature(files, size, materialProps)
+    mat = loaded_materials.get(signature)
+    if not is_valid(mat):
+        mat = build_material(obj.name, files, size, materialProps)
+        loaded_materials[signature] = mat
+
+    if obj.data.users > 1:
+        link_object_material(obj, mat)
+        return
+
+    if len(obj.data.materials) >= 1:
+        obj.data.materials.pop(index = 0)
+    obj.data.materials.append(mat) #add the material to the object
+
+"""Assigns mat to the first material slot of an object whose mesh is shared, leaving the mesh materials untouched"""
+def link_object_material(obj, mat):
+    if len(obj.material_slots) == 0:
+        obj.data.materials.append(None)
+    obj.material_slots[0].link = 'OBJECT'
+    obj.material_slots[0].material = mat
+
+"""Adds an image node for a texture map of files, None when the material has no such map"""
+def add_texture_node(nodes, files, size, texture, colorspace = None):
+    if files is None or texture_key(size, texture) not in files:
+        return None
+
+    image = load_image(files[texture_key(size, texture)], colorspace=colorspace)
+    if image is None:
+        return None
+
+    node = nodes.new(type='ShaderNodeTexImage')
+    node.image = image
+    return node
+
+"""Builds a material instantiating the shared PBR node group, with image nodes for its texture maps only"""
+def build_material(name, files, size, materialProps):
+    mat = bpy.data.materials.new(name=name) #set new material to variable
+    mat.use_nodes = True
+    rgb = None
+
+    # Clear nodes
+    if mat.node_tree:
+        mat.node_tree.links.clear()
+        mat.node_tree.nodes.clear()
+
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    output = nodes.new(type='ShaderNodeOutputMaterial')
+
+    # Handle to the shared PBR node group
+    pbr = nodes.new(type='ShaderNodeGroup')
+    pbr.node_tree = get_pbr_group()
+
+    # Assign material props
+    if 'clearcoat' in materialProps:
+        pbr.inputs['Clearcoat'].default_value = materialProps['clearcoat']
+    if 'clearcoatRoughness' in materialProps:
+        pbr.inputs['Clearcoat Roughness'].default_value = materialProps['clearcoatRoughness']
+    if 'ior' in materialProps:
+        pbr.inputs['IOR'].default_value = materialProps['ior']
+    if 'metalness' in materialProps:
+        pbr.inputs['Metallic'].default_value = materialProps['metalness']
+    if 'transmission' in materialProps:
+        pbr.inputs['Transmission'].default_value = materialProps['transmission']
+    if 'sheen' in materialProps:
+        pbr.inputs['Sheen'].default_value = materialProps['sheen']
+    if 'emissive' in materialProps:
+        if not type(materialProps['emissive']) == str:
+            pbr.inputs['Emission'].default_value = (*linear_from_int(materialProps['emissive']), 1)
+
+    # Image nodes of the maps the material has
+    color = add_texture_node(nodes, files, size, 'color')
+    displacement = add_texture_node(nodes, files, size, 'displacement')
+    normal = add_texture_node(nodes, files, size, 'normal', colorspace='Non-Color')
+    roughness = add_texture_node(nodes, files, size, 'roughness', colorspace='Non-Color')
+
+    if 'color' in materialProps and not type(materialProps['color']) == str:
+        rgb = (*linear_from_int(materialProps['color']), 1)
+
+    #================================================================
+    # Links
+    #================================================================
+
+    # Color
+    if color is not None:
+        links.new(color.outputs["Color"], pbr.inputs["Color Map"])
+        if rgb is not None:
+            pbr.inputs["Tint"].default_value = rgb
+            pbr.inputs["Tint Factor"].default_value = 1
+    else:
+        # Without a color map the base colour is used untinted
+        pbr.inputs["Tint Factor"].default_value = 0
+        if rgb is not None:
+            transmission = pbr.inputs['Transmission'].default_value
+            h,s,v = rgb_to_hsv(*linear_from_int(materialProps['color']))
+            v_range = float(1.0-v)
+            v = v + (transmission*v_range)
+            s_threshold = 0.25
+            if s >= s_threshold:
+                s_range = s-s_threshold
+                s = s - (transmission*s_range)
+            rgb = (*hsv_to_rgb(h,s,v), 1)
+            pbr.inputs["Color Map"].default_value = rgb
+
+    # Normal
+    if normal is not None:
+        normal_map = nodes.new(type='ShaderNodeNormalMap')
+        links.new(normal.outputs["Color"], normal_map.inputs["Color"])
+        links.new(normal_map.outputs["Normal"], pbr.inputs["Normal"])
+
+    # Roughness
+    if roughness is not None:
+        links.new(roughness.outputs["Color"], pbr.inputs["Roughness"])
+    elif 'roughness' in materialProps:
+        pbr.inputs['Roughness'].default_value = materialProps['roughness']
+
+    # Displacement
+    if displacement is not None:
+        links.new(displacement.outputs["Color"], pbr.inputs["Height"])
+        links.new(pbr.outputs["Displacement"], output.inputs["Displacement"])
+        if 'displacementScale' in materialProps:
+            pbr.inputs["Displacement Scale"].default_value = materialProps['displacementScale']
+
+    links.new(pbr.outputs["BSDF"], output.inputs["Surface"])
+
+    #==================================================================
+
+    return mat
+
+
+"""Returns the texture size of a material with these files, see lod.select_texture_size, size defaults to texture_size"""
+def texture_size_for(files, size = None):
+    return select_texture_size(files, size or texture_size, width, height)
+
+"""Load and return json file, raises SceneValidationError listing every schema error"""
+@traced('load_data')
+def load_data(path):
+    return load_scene(path, mesh_size)
+
+"""Renders scene to specified filepath"""
+@traced('render')
+def render(output_dir, output_filename = 'render.jpg'):  
+    bpy.context.scene.render.filepath = os.path.join(os.path.abspath(output_dir), output_filename)
+    bpy.ops.render.render(write_still = True)
+
+def set_render_settings():
+    scene = bpy.context.scene
+    scene.render.engine = 'CYCLES'
+    scene.cycles.device = 'GPU'
+    scene.cycles.samples = samples
+    scene.render.resolution_x = width
+    scene.render.resolution_y = height
+
+    # Fixed thread count when several workers share a machine
+    if threads > 0:
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = threads
+
+
+
+"""Removes images the scene does not use and datablocks left without users"""
+def remove_unused_data(urls):
+    # Forget images the scene does not use
+    for key in list(loaded_images):
+        if key[0] not in urls:
+            img = loaded_images.pop(key)
+            image_files.pop(key, None)
+            if is_valid(img):
+                bpy.data.images.remove(img)
+
+    # Remove datablocks left without users by removed objects
+    for collection in (bpy.data.meshes, bpy.data.materials, bpy.data.lights, bpy.data.cameras):
+        for block in list(collection):
+            if block.users == 0:
+                collection.remove(block)
+
+    # Forget the removed objects
+    hierarchy.prune()
+
+"""Keeps the cache files of the loaded images from being evicted until the current job ends
+
+Blender reads image pixels lazily, so the files of images and materials
+reused from earlier scenes are read again by the render.
+"""
+def use_image_files():
+    for key, img in loaded_images.items():
+        if is_valid(img) and key in image_files:
+            asset_cache.use(image_files[key])
+
+"""Saves the built scene as a .blend file with its images packed, the open file keeps its path"""
+@traced('save_snapshot')
+def save_snapshot(path):
+    pack_images()
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+
+"""Opens a scene saved by save_snapshot and makes it the scene the next one is built from"""
+@traced('open_snapshot')
+def open_snapshot(path, data):
+    bpy.ops.wm.open_mainfile(filepath=path, load_ui=False)
+
+    # Datablocks of the previous file are gone
+    loaded_images.clear()
+    image_files.clear()
+    loaded_materials.clear()
+    loaded_meshes.clear()
+    hierarchy.clear()
+    node_groups.pbr_group = None
+
+    # The objects of the snapshot carry their identities, the next scene only changes what differs
+    built_state.clear()
+    built_state.update(scene_state(data, (texture_size, mesh_size)))
+
+"""Loads, builds and renders one scene file, or opens its snapshot when one was saved"""
+def render_scene(path, output_filename, prefetch_workers):
+    json = load_data(path)
+
+    # Keyed on the json as written, before the texture plan annotates it
+    key = None
+    if snapshot_cache is not None:
+        key = snapshot_key(json, snapshot_options(texture_size, mesh_size, width, height, texture_budget, bpy.app.version_string))
+
+    # Size the textures of each object to its share of the frame
+    if texture_size == AUTO:
+        with tracer.span('plan_textures'):
+            plan = plan_texture_sizes(json, width, height, texture_budget)
+        print("Textures: {0} ({1:.0f} MiB decoded{2})".format(plan['textures'], plan['bytes'] / (1 << 20), ", over budget" if plan['over_budget'] else ""))
+
+    # Skip the build when the same scene was built before with the same asset sizes
+    snapshot = None
+    if key is not None and not rebuild:
+        snapshot = snapshot_cache.find(key)
+    if snapshot is not None:
+        print("Opening snapshot {0}".format(snapshot))
+        open_snapshot(snapshot, json)
+        set_render_settings()
+        render(output_dir = output_dir, output_filename = output_filename)
+        return
+
+    use_preprocess = preprocess_workers != 0 and can_preprocess()
+
+    # Images kept from earlier scenes may be used again, their files must outlive the downloads of this one
+    use_image_files()
+
+    # Download every asset before building the scene so builders only read from disk
+    with tracer.span('prefetch'):
+        prefetch_scene(json, asset_cache, texture_size, mesh_size, object_texture_size, max_workers=prefetch_workers, render_size=(width, height), resize=not use_preprocess)
+
+    # Decode, resize and convert textures in worker processes while bpy is idle
+    global prepared_images
+    prepared_images = {}
+    if use_preprocess:
+        with tracer.span('preprocess'):
+            jobs = collect_images(json, texture_size, mesh_size, object_texture_size, render_size=(width, height))
+            prepared_images = preprocess_images(jobs, asset_cache, preprocess_workers)
+        print("Prepared {0} of {1} images".format(len(prepared_images), len(jobs)))
+
+    image_stats.update(requests=0, reused=0, loaded=0)
+
+    # Only build, move or delete what changed since the previous scene
+    with tracer.span('update_scene'):
+        update_scene(json, built_state, sys.modules[__name__], (texture_size, mesh_size))
+
+    with tracer.span('remove_unused_data'):
+        remove_unused_data(set(url for url, ext in collect_assets(json, texture_size, mesh_size, object_texture_size, render_size=(width, height))))
+
+    print("Images: {requests} requested, {reused} reused, {loaded} loaded".format(**image_stats))
+
+    if key is not None:
+        print("Snapshot saved to {0}".format(snapshot_cache.store(key, save_snapshot)))
+
+    set_render_settings()
+
+    render(output_dir = output_dir, output_filename = output_filename)
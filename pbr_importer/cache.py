@@ -0,0 +1,455 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from . downloader import Downloader, DownloadError
+from . trace import tracer
+
+
+# Name of the sidecar index stored inside the cache folder
+INDEX_FILENAME = "index.json"
+
+# Lock guarding the index against other processes sharing the folder
+LOCK_FILENAME = "index.lock"
+
+# Folder holding the per-url download locks
+LOCKS_FOLDER = "locks"
+
+# Bytes read per iteration while hashing a file
+CHUNK_SIZE = 1024 * 1024
+
+"""Returns the absolute cache path of the file downloaded from url"""
+def cache_filename(cache_path, url, ext):
+    # Hash URL
+    digest = hashlib.sha256(url.encode()).hexdigest()
+
+    return os.path.abspath(os.path.join(cache_path, digest + ext))
+
+
+class CacheMissError(IOError):
+    """Raised when an offline cache does not hold a requested url"""
+
+
+class FileLock:
+    """Exclusive lock on a file, shared between processes and threads"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, mode='a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class AssetCache:
+    """On-disk asset cache keyed by sha256(url).
+
+    Files are downloaded to a temporary file and renamed into place, so a
+    killed download never leaves a truncated asset behind. Only files
+    recorded in the sidecar index are cache hits; the index keeps their
+    size, content hash, validators and last access time, which drives LRU
+    eviction once the folder grows past max_bytes.
+
+    Each entry's content hash is checked the first time this process looks
+    it up, later lookups only compare sizes; verify_hash checks it on every
+    lookup.
+
+    Entries older than ttl seconds are revalidated with a conditional
+    request (If-None-Match / If-Modified-Since); a 304 only refreshes the
+    entry. An offline cache never touches the network and raises
+    CacheMissError for anything it does not hold.
+
+    Several processes can share the folder: index updates are made under a
+    file lock on the latest index on disk, and a url is downloaded by one
+    process at a time. Files looked up or stored inside a job() are never
+    evicted by this process before the job ends, and the job writes its
+    access times to the index so other processes evict older files first.
+    """
+
+    def __init__(self, path, max_bytes=None, verify_hash=False, ttl=None, offline=False, downloader=None):
+        self.path = os.path.abspath(path)
+        self.downloader = downloader if downloader is not None else Downloader()
+        self.max_bytes = max_bytes
+        self.verify_hash = verify_hash
+        self.ttl = ttl
+        self.offline = offline
+        self.index_path = os.path.join(self.path, INDEX_FILENAME)
+        self.lock_path = os.path.join(self.path, LOCK_FILENAME)
+        self.locks_path = os.path.join(self.path, LOCKS_FOLDER)
+        self._lock = threading.Lock()
+        self._touched = {}
+        # Content hash each key was last verified against by this process
+        self._verified = {}
+        # Keys used by the current job, None outside of a job
+        self._in_use = None
+
+        if not os.path.exists(self.locks_path):
+            os.makedirs(self.locks_path, exist_ok=True)
+
+        self.entries = self._read_index()
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, mode='r') as file:
+                return json.load(file).get('entries', {})
+        except (OSError, ValueError):
+            # A corrupt index only costs re-downloads
+            return {}
+
+    def _write_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.index')
+        with os.fdopen(fd, mode='w') as file:
+            json.dump({'version': 1, 'entries': self.entries}, file)
+        os.replace(tmp_path, self.index_path)
+
+    def _update(self, change=None):
+        """Applies change to the latest index on disk and writes it back"""
+        with self._lock, FileLock(self.lock_path):
+            self.entries = self._read_index()
+
+            # Pending access times of this process
+            for key, last_access in self._touched.items():
+                if key in self.entries:
+                    self.entries[key]['last_access'] = max(self.entries[key]['last_access'], last_access)
+            self._touched = {}
+
+            if change is not None:
+                change(self.entries)
+            self._write_index()
+
+    def save(self):
+        """Writes pending access times to the index"""
+        self._update()
+
+    def reload(self):
+        """Reads entries added by other processes"""
+        with self._lock, FileLock(self.lock_path):
+            self.entries = self._read_index()
+
+    def filename(self, url, ext):
+        """Returns the file path for url inside the cache"""
+        return cache_filename(self.path, url, ext)
+
+    def lookup(self, url, ext):
+        """Returns the index entry for url if its file is complete, otherwise None"""
+        path = self.filename(url, ext)
+        key = os.path.basename(path)
+
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        # Drop entries whose file vanished, was truncated or was modified
+        valid = os.path.exists(path) and os.path.getsize(path) == entry['size']
+        if valid and (self.verify_hash or self._verified.get(key) != entry['sha256']):
+            valid = file_sha256(path) == entry['sha256']
+        if not valid:
+            self.discard(url, ext)
+            return None
+
+        with self._lock:
+            self._verified[key] = entry['sha256']
+            if self._in_use is not None:
+                self._in_use.add(key)
+
+        return entry
+
+    def status(self, url, ext):
+        """Returns ("cached", "stale" when fetch would revalidate it, or "missing") and the index entry, without any request"""
+        entry = self.lookup(url, ext)
+        if entry is None:
+            return 'missing', None
+        return ('stale' if self._is_stale(entry) else 'cached'), entry
+
+    def fetch(self, url, ext):
+        """Returns the local path of url, downloading it on a cache miss"""
+        with tracer.span('fetch', url=url) as span:
+            path = self.filename(url, ext)
+            entry = self.lookup(url, ext)
+            span['hit'] = entry is not None
+
+            if entry is None:
+                if self.offline:
+                    raise CacheMissError("{0} is not in the cache and the cache is offline".format(url))
+
+                # Another process may be downloading the same url, wait for it
+                with FileLock(self._lock_filename(os.path.basename(path))):
+                    self.reload()
+                    entry = self.lookup(url, ext)
+                    if entry is None:
+                        tracer.count('cache_misses')
+                        self._download(url, path)
+                        return path
+
+            tracer.count('cache_hits')
+            if self._is_stale(entry):
+                self._revalidate(url, path, entry)
+            else:
+                self.touch(url, ext)
+
+            return path
+
+    def derive(self, url, ext, name, build, derived_ext=None):
+        """Returns the path of a file made from url by build(source, target), e.g. a resized copy
+
+        Derived files are cached under "<url>#<name>@<source hash>" like
+        downloads, so they are built once, shared between processes, evicted
+        with the rest and rebuilt when the source file changes. They keep the
+        extension of the source unless derived_ext is given.
+        """
+        source = self.fetch(url, ext)
+        with self._lock:
+            entry = self.entries.get(os.path.basename(source), {})
+
+        if derived_ext is None:
+            derived_ext = ext
+
+        def write(target):
+            with tracer.span('derive', url=url, variant=name):
+                build(source, target)
+
+        return self.make("{0}#{1}@{2}".format(url, name, entry.get('sha256')), derived_ext, write)
+
+    def make(self, url, ext, write):
+        """Returns the cache path of url, made by write(path) when it is not cached yet
+
+        For files made locally rather than downloaded. A file is made by
+        one process at a time, the others wait for it and use it.
+        """
+        path = self.filename(url, ext)
+        if self.lookup(url, ext) is not None:
+            self.touch(url, ext)
+            tracer.count('derived_hits')
+            return path
+
+        with FileLock(self._lock_filename(os.path.basename(path))):
+            self.reload()
+            if self.lookup(url, ext) is not None:
+                return path
+
+            tracer.count('derived_misses')
+            self.put(url, ext, write)
+
+        return path
+
+    def put(self, url, ext, write):
+        """Stores the file write(path) makes under url and returns its cache path
+
+        For files made locally rather than downloaded. write gets a
+        temporary path inside the cache folder, which is renamed into place
+        once it returns.
+        """
+        path = self.filename(url, ext)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.part' + ext)
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.store(url, path, os.path.getsize(path), file_sha256(path))
+
+        return path
+
+    def _is_stale(self, entry):
+        if self.offline or self.ttl is None:
+            return False
+        return time.time() - entry.get('validated', 0) > self.ttl
+
+    def _revalidate(self, url, path, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            modified = self._download(url, path, headers)
+        except DownloadError as e:
+            # Keep rendering with the stale copy when the server cannot answer
+            print("Cannot revalidate {0}, using cached copy: {1}".format(url, e))
+            self.touch(url, os.path.splitext(path)[1])
+            return
+
+        if not modified:
+            # Not modified, the cached file is still current
+            key = os.path.basename(path)
+            now = time.time()
+
+            def refresh(entries):
+                if key in entries:
+                    entries[key]['validated'] = now
+                    entries[key]['last_access'] = now
+            self._update(refresh)
+
+    def touch(self, url, ext):
+        """Updates the last access time of url, written by save()"""
+        key = os.path.basename(self.filename(url, ext))
+        now = time.time()
+        with self._lock:
+            if key in self.entries:
+                self.entries[key]['last_access'] = now
+                self._touched[key] = now
+
+    def use(self, path):
+        """Touches a file of the cache and keeps it for the current job, e.g. one an earlier job loaded and Blender still reads"""
+        key = os.path.basename(path)
+        now = time.time()
+        with self._lock:
+            if key in self.entries:
+                self.entries[key]['last_access'] = now
+                self._touched[key] = now
+                if self._in_use is not None:
+                    self._in_use.add(key)
+
+    def discard(self, url, ext):
+        """Removes url from the cache"""
+        key = os.path.basename(self.filename(url, ext))
+        self._update(lambda entries: self._remove(entries, key))
+
+    def _lock_filename(self, key):
+        return os.path.join(self.locks_path, key + '.lock')
+
+    def _remove(self, entries, key):
+        entries.pop(key, None)
+        path = os.path.join(self.path, key)
+        if os.path.exists(path):
+            os.remove(path)
+
+        # The download lock goes with its entry, at worst a url is then fetched twice at once
+        try:
+            os.remove(self._lock_filename(key))
+        except OSError:
+            # Missing, or held open by another process on Windows
+            pass
+
+    def _download(self, url, path, headers=None):
+        """Downloads url into path, returns False when the server answered 304"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.part')
+        try:
+            with tracer.span('download', url=url) as span, os.fdopen(fd, mode='wb') as file:
+                result = self.downloader.download(url, file, headers)
+                span.update(status=result.status, bytes=result.size, attempts=result.attempts)
+            tracer.count('download_bytes', result.size)
+
+            if result.status == 304:
+                return False
+
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.store(url, path, result.size, result.sha256, result.headers.get('ETag'), result.headers.get('Last-Modified'))
+
+        return True
+
+    def store(self, url, path, size, sha256, etag=None, last_modified=None):
+        """Records a completed file in the index and evicts old entries past the byte budget"""
+        key = os.path.basename(path)
+        now = time.time()
+
+        # Hashed while it was written, no need to read it again
+        with self._lock:
+            self._verified[key] = sha256
+            if self._in_use is not None:
+                self._in_use.add(key)
+
+        def add(entries):
+            entries[key] = {
+                'url': url,
+                'size': size,
+                'sha256': sha256,
+                'etag': etag,
+                'last_modified': last_modified,
+                'last_access': now,
+                'validated': now,
+            }
+            self._evict(entries, keep=key)
+        self._update(add)
+
+    @contextmanager
+    def job(self):
+        """Keeps the files looked up or stored in the with block from being evicted by this process until it ends
+
+        For the files of one scene, which Blender reads until it is
+        rendered. Access times are written to the index when the job ends
+        and on save().
+        """
+        with self._lock:
+            self._in_use = set()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._in_use = None
+            self.save()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits max_bytes"""
+        self._update(self._evict)
+
+    def _evict(self, entries, keep=None):
+        if self.max_bytes is None:
+            return
+        # Called by _update, which holds self._lock
+        in_use = self._in_use or ()
+        total = sum(entry['size'] for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            # Files of the current job stay even past the budget
+            if key == keep or key in in_use:
+                continue
+            total -= entry['size']
+            self._remove(entries, key)
+
+    def size(self):
+        """Total bytes of all indexed files"""
+        with self._lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def close(self):
+        """Flushes pending access times to the index"""
+        if self._touched:
+            self.save()
+
+
+"""Returns the sha256 hex digest of a file, read in chunks"""
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -0,0 +1,60 @@
+import math
+
+
+def rgb_int2tuple(rgbint):
+  return ( rgbint // 256 // 256 % 256, rgbint // 256 % 256, rgbint % 256)
+
+def srgb_to_linear(x: float) -> float:
+	if x <= 0.0:
+		return 0.0
+	elif x >= 1:
+		return 1.0
+	elif x < 0.04045:
+		return x / 12.92
+	else:
+		return ((x + 0.055) / 1.055) ** 2.4
+
+def linear_from_int(rgbint):
+  return list(map (lambda y: srgb_to_linear(y/255), rgb_int2tuple(rgbint)))
+
+
+def rgb_to_hsv(r, g, b):
+    r = float(r)
+    g = float(g)
+    b = float(b)
+    high = max(r, g, b)
+    low = min(r, g, b)
+    h, s, v = high, high, high
+
+    d = high - low
+    s = 0 if high == 0 else d/high
+
+    if high == low:
+        h = 0.0
+    else:
+        h = {
+            r: (g - b) / d + (6 if g < b else 0),
+            g: (b - r) / d + 2,
+            b: (r - g) / d + 4,
+        }[high]
+        h /= 6
+
+    return h, s, v
+
+def hsv_to_rgb(h, s, v):
+    i = math.floor(h*6)
+    f = h*6 - i
+    p = v * (1-s)
+    q = v * (1-f*s)
+    t = v * (1-(1-f)*s)
+
+    r, g, b = [
+        (v, t, p),
+        (q, v, p),
+        (p, v, t),
+        (p, q, v),
+        (t, p, v),
+        (v, p, q),
+    ][int(i%6)]
+
+    return r, g, b
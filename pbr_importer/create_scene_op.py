@@ -2,51 +2,37 @@ import bpy
 from bpy.types import Operator
 
 from . data import Data
-from . functions import * 
+from . functions import OPTIONS, get_asset_cache, get_builders, pack_images_on_save
+from . prefetch import prefetch_scene
+from . incremental import update_scene
 
 
 class CreateSceneOP(Operator):
     """Create Scene"""
     bl_idname = 'pbr_import.create_scene'
     bl_label = 'Create Scene'
- 
+
 
     def execute(self, context):
-        # Remove all objects
-        for obj in bpy.data.objects:
-            bpy.data.objects.remove(obj)
-
-        # Create camera
-        create_camera(Data.json['camera'])
-
-        # Create light
-        create_light(Data.json['light'])
-
-        # Import HDRI image as enviroment
-        import_hdri(Data.json['environment'])
-
-        # Create floor
-        create_floor(Data.json['floor'])
-
-        # Import all objects
-        for i in Data.json['objects']:
-            if i['name'] == "Sphere":
-                create_sphere(i)
-            if i['name'] == "Cube":
-                create_cube(i)
-            if i['name'] == "Plane":
-                create_plane(i)
-            if i['name'] == "Cylinder":
-                create_cylinder(i)
-            if i['type'] == "gltf":
-                import_glb(i)
-            if i['type'] == "dynamic":
-                import_dynamic_glb(i)
+        builders = get_builders()
+        builders.image_stats.update(requests=0, reused=0, loaded=0)
+
+        # Download every asset before building the scene so builders only read from disk
+        prefetch_scene(Data.json, get_asset_cache(), OPTIONS.texture_size, OPTIONS.mesh_size, object_texture_size=OPTIONS.object_texture_size)
+
+        # Only build, move or delete what changed since the last import
+        update_scene(Data.json, Data.state, builders, (OPTIONS.texture_size, OPTIONS.mesh_size))
+
+        get_asset_cache().close()
+
+        self.report({'INFO'}, "Images: {requests} requested, {reused} reused, {loaded} loaded".format(**builders.image_stats))
 
         return {'FINISHED'}
 
 def register():
     bpy.utils.register_class(CreateSceneOP)
+    bpy.app.handlers.save_pre.append(pack_images_on_save)
 
 def unregister():
-    bpy.utils.unregister_class(CreateSceneOP)
\ No newline at end of file
+    bpy.utils.unregister_class(CreateSceneOP)
+    bpy.app.handlers.save_pre.remove(pack_images_on_save)
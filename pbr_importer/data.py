@@ -4,6 +4,9 @@ import bpy
 class Data:
     json = None
 
+    # State index of the scene built from json, see incremental.update_scene
+    state = {}
+
     
 
    
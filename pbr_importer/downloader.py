@@ -0,0 +1,292 @@
+import ssl
+import time
+import random
+import hashlib
+import threading
+import http.client
+import urllib.request
+from base64 import b64encode
+from urllib.parse import urlsplit, urljoin, unquote
+
+
+# Bytes read per iteration while streaming a response
+CHUNK_SIZE = 1024 * 1024
+
+# Status codes answered with a Location header to follow
+REDIRECTS = (301, 302, 303, 307, 308)
+
+# Maximum number of redirects followed for one url
+MAX_REDIRECTS = 5
+
+# Errors of a kept-alive connection the server closed while it was idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+
+class DownloadError(IOError):
+    """Raised when a url cannot be downloaded, status is None for network errors"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class DownloadResult:
+    """Outcome of a single download"""
+
+    def __init__(self, url, status, headers, size, sha256, seconds, attempts):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.size = size
+        self.sha256 = sha256
+        self.seconds = seconds
+        self.attempts = attempts
+
+
+class Downloader:
+    """HTTP(S) client shared by all asset downloads.
+
+    Connections are kept alive and pooled per host, so a scene served from
+    one CDN pays one TLS handshake per concurrent connection. Timeouts,
+    dropped connections and 5xx answers are retried with exponential
+    backoff and jitter, a pooled connection the server already closed is
+    replaced right away. Proxies are taken from the HTTP_PROXY, HTTPS_PROXY
+    and NO_PROXY environment variables. Every download is recorded in results.
+    """
+
+    def __init__(self, timeout=30, retries=3, backoff=0.5, max_backoff=10, ssl_context=None, max_idle=4):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ssl_context = ssl_context if ssl_context is not None else ssl.create_default_context()
+        self.max_idle = max_idle
+        self.proxies = urllib.request.getproxies()
+        self.results = []
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _proxy(self, parts):
+        """Returns the split url of the proxy for parts, None to connect directly"""
+        proxy = self.proxies.get(parts.scheme)
+        if not proxy or urllib.request.proxy_bypass(parts.hostname or ''):
+            return None
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        return urlsplit(proxy)
+
+    def _proxy_headers(self, proxy):
+        """Returns the Proxy-Authorization header for the credentials in the proxy url"""
+        if proxy.username is None:
+            return {}
+        credentials = "{0}:{1}".format(unquote(proxy.username), unquote(proxy.password or ''))
+        return {'Proxy-Authorization': 'Basic ' + b64encode(credentials.encode('utf-8')).decode('ascii')}
+
+    def _connect(self, parts):
+        """Opens a connection to the host of parts, through its proxy if any"""
+        proxy = self._proxy(parts)
+        netloc = parts.netloc if proxy is None else "{0}:{1}".format(proxy.hostname, proxy.port or 8080)
+
+        if parts.scheme == 'https':
+            conn = http.client.HTTPSConnection(netloc, timeout=self.timeout, context=self.ssl_context)
+            if proxy is not None:
+                # TLS runs end to end through a CONNECT tunnel
+                conn.set_tunnel(parts.hostname, parts.port or 443, headers=self._proxy_headers(proxy))
+            return conn
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _acquire(self, parts):
+        """Returns a pooled connection to the host of parts or a new one, and whether it was pooled"""
+        with self._lock:
+            idle = self._idle.get((parts.scheme, parts.netloc))
+            if idle:
+                return idle.pop(), True
+
+        return self._connect(parts), False
+
+    def _send(self, method, parts, headers):
+        """Sends a request for parts and returns its connection and response
+
+        A pooled connection the server closed while it was idle fails before
+        any answer arrives, the request is sent again on a new connection
+        without counting as a retry.
+        """
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        # Plain http goes through the proxy with the full url
+        proxy = self._proxy(parts) if parts.scheme == 'http' else None
+        if proxy is not None:
+            path = "http://{0}{1}".format(parts.netloc, path)
+            headers = dict(headers, **self._proxy_headers(proxy))
+
+        conn, reused = self._acquire(parts)
+        try:
+            conn.request(method, path, headers=headers)
+            return conn, conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        conn = self._connect(parts)
+        try:
+            conn.request(method, path, headers=headers)
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def _release(self, parts, conn):
+        with self._lock:
+            idle = self._idle.setdefault((parts.scheme, parts.netloc), [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Closes all idle connections"""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle = {}
+
+    def download(self, url, out, headers=None):
+        """Streams url into the binary file out and returns a DownloadResult.
+
+        A 304 answer to a conditional request is returned without writing
+        anything; other non-2xx answers raise DownloadError.
+        """
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                status, response_headers, size, sha256 = self._request(url, out, headers or {})
+                break
+            except DownloadError as e:
+                if e.status is not None and e.status < 500:
+                    raise
+                error = e
+            except (OSError, http.client.HTTPException) as e:
+                # Timeouts, resets and stale keep-alive connections
+                error = DownloadError("Cannot download {0}: {1}".format(url, e))
+
+            if attempt > self.retries:
+                raise error
+
+            # Exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+
+            # Start the file over
+            out.seek(0)
+            out.truncate()
+
+        result = DownloadResult(url, status, response_headers, size, sha256, time.time() - start, attempt)
+        with self._lock:
+            self.results.append(result)
+
+        return result
+
+    def _request(self, url, out, headers):
+        for i in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise DownloadError("Unsupported url {0}".format(url), status=0)
+
+            conn, response = self._send('GET', parts, headers)
+            try:
+                if response.status in REDIRECTS and response.getheader('Location'):
+                    response.read()
+                    self._release(parts, conn)
+                    url = urljoin(url, response.getheader('Location'))
+                    continue
+
+                if response.status == 304:
+                    response.read()
+                    self._release(parts, conn)
+                    return response.status, response.headers, 0, None
+
+                if response.status >= 300:
+                    response.read()
+                    self._release(parts, conn)
+                    raise DownloadError("Cannot download {0}: HTTP {1} {2}".format(url, response.status, response.reason), status=response.status)
+
+                sha256 = hashlib.sha256()
+                size = 0
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+
+                expected = response.getheader('Content-Length')
+                if expected is not None and int(expected) != size:
+                    conn.close()
+                    raise DownloadError("Truncated download of {0}: {1} of {2} bytes".format(url, size, expected))
+
+                # A response without a length ends with the connection
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._release(parts, conn)
+
+                return response.status, response.headers, size, sha256.hexdigest()
+            except DownloadError:
+                raise
+            except Exception:
+                # Never reuse a connection in an unknown state
+                conn.close()
+                raise
+
+        raise DownloadError("Too many redirects for {0}".format(url), status=0)
+
+    def content_length(self, url):
+        """Returns the size in bytes the server announces for url with a HEAD request, None when it sends none"""
+        for i in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise DownloadError("Unsupported url {0}".format(url), status=0)
+
+            try:
+                conn, response = self._send('HEAD', parts, {})
+            except (OSError, http.client.HTTPException) as e:
+                raise DownloadError("Cannot reach {0}: {1}".format(url, e))
+            try:
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise DownloadError("Cannot reach {0}: {1}".format(url, e))
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(parts, conn)
+
+            if response.status in REDIRECTS and response.getheader('Location'):
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            if response.status >= 300:
+                raise DownloadError("Cannot reach {0}: HTTP {1} {2}".format(url, response.status, response.reason), status=response.status)
+
+            length = response.getheader('Content-Length')
+            return int(length) if length is not None else None
+
+        raise DownloadError("Too many redirects for {0}".format(url), status=0)
+
+    def report(self):
+        """Returns one line per download with its size and latency"""
+        lines = []
+        with self._lock:
+            results = list(self.results)
+        for result in results:
+            lines.append("{0} {1} {2} bytes in {3:.3f}s ({4} attempts)".format(result.status, result.url, result.size, result.seconds, result.attempts))
+        return lines
@@ -0,0 +1,237 @@
+#########################################################################################################################################
+#
+# Render farm driver, runs without Blender: python -m pbr_importer.farm --input MANIFEST --output OUTPUT [options] -- [pbr_import options]
+#
+# arguments:
+# [-h] -> help
+# --input INPUT -> scene json file, directory of scene files, glob pattern or .jsonl manifest (string)
+# --output OUTPUT -> output directory (string)
+# --workers N -> number of worker Blender processes (int)
+# --threads N -> render threads per worker, defaults to the cores divided among the workers (int)
+# --retries N -> times a scene that crashed its worker is retried (int)
+# --timeout SECONDS -> kill workers that report no scene for this long, the scene they were rendering is retried like a crash (float)
+# --blender BLENDER -> blender executable (string)
+# --script SCRIPT -> pbr_import.py path (string)
+# --worker_command COMMAND -> command replacing "blender --background --python pbr_import.py --" (string)
+#
+# everything after -- is passed to every worker, e.g. -- --width 800 --height 600 --cache_dir /shared/cache
+#
+#########################################################################################################################################
+
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import tempfile
+import subprocess
+
+from . batch import expand_inputs, read_report, write_report, REPORT_FILENAME
+
+
+# pbr_import.py lives next to the package
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pbr_import.py')
+
+# Seconds between checks of the running workers
+POLL_INTERVAL = 0.1
+
+# Rounds in a row without any reported scene after which the pending scenes fail
+MAX_EMPTY_ROUNDS = 3
+
+"""Splits jobs into at most count round-robin shards"""
+def shard(jobs, count):
+    shards = [jobs[i::count] for i in range(max(1, count))]
+    return [s for s in shards if len(s) > 0]
+
+"""Writes a JSONL manifest for a shard"""
+def write_manifest(path, jobs):
+    with open(path, mode='w') as file:
+        for scene_path, output_filename in jobs:
+            file.write(json.dumps({'input': os.path.abspath(scene_path), 'output': output_filename}) + '\n')
+
+"""Returns the command line of a worker rendering manifest"""
+def worker_command(base_command, manifest, output_dir, report, threads, extra_args):
+    return base_command + [
+        '--input', manifest,
+        '--output', output_dir,
+        '--report', report,
+        '--threads', str(threads),
+    ] + extra_args
+
+"""Returns a stamp of the report of a worker that changes whenever it reports a scene"""
+def _report_stamp(report):
+    try:
+        return os.stat(report).st_mtime_ns
+    except OSError:
+        return None
+
+"""Waits for the workers of a round, killing the ones that stopped making progress
+
+A worker is killed once timeout seconds passed since its launch or since
+it last reported a scene. Returns the error of each worker, in order.
+"""
+def _wait(processes, timeout):
+    errors = [None] * len(processes)
+    progress = [(time.time(), None)] * len(processes)
+    running = list(range(len(processes)))
+    while len(running) > 0:
+        for i in list(running):
+            process, log, report, shard_jobs = processes[i]
+            if process.poll() is not None:
+                errors[i] = "worker exited with code {0}".format(process.returncode)
+                running.remove(i)
+                continue
+            if timeout is None:
+                continue
+
+            stamp = _report_stamp(report)
+            if stamp != progress[i][1]:
+                progress[i] = (time.time(), stamp)
+            elif time.time() - progress[i][0] > timeout:
+                # A hung worker would block the driver forever
+                process.kill()
+                process.wait()
+                errors[i] = "worker timed out after {0} seconds without finishing a scene".format(timeout)
+                running.remove(i)
+
+        if len(running) > 0:
+            time.sleep(POLL_INTERVAL)
+
+    for process, log, report, shard_jobs in processes:
+        log.close()
+
+    return errors
+
+"""Renders jobs with parallel workers, retrying the scenes of crashed workers
+
+Workers render their scenes in order, so when one crashes or is killed
+the first scene it had not reported is the one that failed: that scene
+uses up one of its retries, the scenes after it are queued again as they
+were. Workers are killed after timeout seconds without reporting a scene.
+After MAX_EMPTY_ROUNDS rounds in a row where no worker reported anything
+every pending scene fails, the workers themselves are broken. Returns one
+result per job, in job order.
+"""
+def run(jobs, output_dir, base_command, workers, threads, extra_args=None, retries=1, work_dir=None, timeout=None):
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='pbr-farm-')
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    results = {}
+    pending = list(jobs)
+    failures = {}
+    errors = {}
+    failed = []
+    empty_rounds = 0
+    attempt = 0
+
+    while len(pending) > 0:
+        # Launch one worker per shard
+        processes = []
+        for i, shard_jobs in enumerate(shard(pending, workers)):
+            name = "round{0}-worker{1}".format(attempt, i)
+            manifest = os.path.join(work_dir, name + '.jsonl')
+            report = os.path.join(work_dir, name + '.report.json')
+            log = open(os.path.join(work_dir, name + '.log'), mode='w')
+            write_manifest(manifest, shard_jobs)
+
+            command = worker_command(base_command, manifest, output_dir, report, threads, extra_args or [])
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+            processes.append((process, log, report, shard_jobs))
+        attempt += 1
+
+        # Gather results, scenes missing from a report were lost with their worker
+        requeued = []
+        any_reported = False
+        for (process, log, report, shard_jobs), error in zip(processes, _wait(processes, timeout)):
+            try:
+                reported = dict((os.path.basename(result['output']), result) for result in read_report(report))
+            except (OSError, ValueError, KeyError):
+                reported = {}
+            any_reported = any_reported or len(reported) > 0
+
+            lost = [job for job in shard_jobs if job[1] not in reported]
+            for job in shard_jobs:
+                if job[1] in reported:
+                    results[job[1]] = reported[job[1]]
+
+            # Only the scene the worker was rendering is charged
+            if len(lost) > 0:
+                running = lost[0]
+                failures[running[1]] = failures.get(running[1], 0) + 1
+                errors[running[1]] = error
+                if failures[running[1]] > retries:
+                    failed.append(running)
+                else:
+                    requeued.append(running)
+                requeued += lost[1:]
+
+        if len(requeued) > 0:
+            print("{0} scenes queued again after crashed or timed out workers".format(len(requeued)))
+
+        empty_rounds = 0 if any_reported else empty_rounds + 1
+        if empty_rounds >= MAX_EMPTY_ROUNDS:
+            for job in requeued:
+                errors.setdefault(job[1], "no worker reported a scene in {0} rounds".format(MAX_EMPTY_ROUNDS))
+            failed += requeued
+            requeued = []
+        pending = requeued
+
+    for scene_path, output_filename in failed:
+        results[output_filename] = {
+            'input': scene_path,
+            'output': os.path.join(os.path.abspath(output_dir), output_filename),
+            'status': 'crashed',
+            'error': errors.get(output_filename),
+            'seconds': None,
+        }
+
+    return [results[output_filename] for scene_path, output_filename in jobs]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Split driver arguments from the ones passed to pbr_import.py
+    extra_args = []
+    if '--' in argv:
+        idx = argv.index('--')
+        argv, extra_args = argv[:idx], argv[idx+1:]
+
+    parser = argparse.ArgumentParser(prog='python -m pbr_importer.farm')
+    parser.add_argument('--input', help="scene file, directory, glob or .jsonl manifest", type= str, required=True)
+    parser.add_argument('--output', help="output directory", type= str, required=True)
+    parser.add_argument('--workers', help="worker processes", type= int, default= 2)
+    parser.add_argument('--threads', help="render threads per worker", type= int, default= None)
+    parser.add_argument('--retries', help="retries of a scene that crashed its worker", type= int, default= 1)
+    parser.add_argument('--timeout', help="seconds a worker may spend on one scene before it is killed, unlimited when not set", type= float, default= None)
+    parser.add_argument('--blender', help="blender executable", type= str, default='blender')
+    parser.add_argument('--script', help="pbr_import.py path", type= str, default=SCRIPT_PATH)
+    parser.add_argument('--worker_command', help="command replacing blender --background --python pbr_import.py --", type= str, default=None)
+    args = parser.parse_args(argv)
+
+    if args.worker_command is not None:
+        base_command = shlex.split(args.worker_command)
+    else:
+        base_command = [args.blender, '--background', '--python', args.script, '--']
+
+    threads = args.threads
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // max(1, args.workers))
+
+    jobs = expand_inputs(args.input)
+    results = run(jobs, args.output, base_command, args.workers, threads, extra_args, args.retries, timeout=args.timeout)
+
+    write_report(os.path.join(os.path.abspath(args.output), REPORT_FILENAME), results)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print("{0} scenes rendered, {1} failed".format(len(results) - len(failed), len(failed)))
+
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+
+
+# Name prefix of the objects a dynamic glb shows its image on
+DYNAMIC_IMAGE_PREFIX = "dynamic_image"
+
+def _is_valid(obj):
+    try:
+        obj.name
+    except ReferenceError:
+        return False
+    return True
+
+
+class HierarchyIndex:
+    """Children of the objects the builders created, by parent and by name prefix.
+
+    Objects are added with the objects each import or duplicate created,
+    so hierarchy queries never scan bpy.data.objects. Lookups skip objects
+    removed from Blender or moved to another parent since they were added,
+    prune drops them for good.
+    """
+
+    def __init__(self, prefixes=(DYNAMIC_IMAGE_PREFIX,)):
+        self.prefixes = tuple(prefixes)
+        self._children = {}
+        self._prefixed = {}
+        self._collectors = []
+
+    @contextmanager
+    def collect(self):
+        """Yields a list receiving every object added until the with block ends"""
+        added = []
+        self._collectors.append(added)
+        try:
+            yield added
+        finally:
+            self._collectors.remove(added)
+
+    def add(self, objects):
+        """Indexes objects under their current parent and name"""
+        for obj in objects:
+            for added in self._collectors:
+                added.append(obj)
+            self._children.setdefault(obj.parent, []).append(obj)
+            for prefix in self.prefixes:
+                if obj.name.startswith(prefix):
+                    self._prefixed.setdefault((obj.parent, prefix), []).append(obj)
+
+    def _current(self, objects, parent):
+        return [obj for obj in objects if _is_valid(obj) and obj.parent == parent]
+
+    def children(self, obj):
+        """Returns the indexed children of obj"""
+        return self._current(self._children.get(obj, []), obj)
+
+    def find_child(self, obj, prefix):
+        """Returns the last indexed child of obj whose name starts with prefix, None when there is none"""
+        children = self._current(self._prefixed.get((obj, prefix), []), obj)
+        return children[-1] if len(children) > 0 else None
+
+    def prune(self):
+        """Drops objects removed from Blender"""
+        for index, parent_of in ((self._children, lambda key: key), (self._prefixed, lambda key: key[0])):
+            for key in list(index):
+                parent = parent_of(key)
+                objects = [obj for obj in index[key] if _is_valid(obj)]
+                if len(objects) == 0 or (parent is not None and not _is_valid(parent)):
+                    del index[key]
+                else:
+                    index[key] = objects
+
+    def clear(self):
+        """Forgets every object, e.g. after another file was opened"""
+        self._children.clear()
+        self._prefixed.clear()
@@ -1,18 +1,14 @@
 import bpy
-import json
 from bpy_extras.io_utils import ImportHelper
 from bpy.types import Operator
 from bpy.props import StringProperty
 
 from . data import Data
+from . stream import load_scene
 
-# Load and return json file
+# Load and return json file, raises SceneValidationError listing every schema error
 def load_data(path):
-    file = open(path, mode='r')
-    data = file.read()
-    file.close()
-
-    return json.loads(data)
+    return load_scene(path, 'gltf_original')
 
 class ImportJSON_OT(Operator, ImportHelper):
     """Import json"""
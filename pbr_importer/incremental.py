@@ -0,0 +1,96 @@
+import bpy
+
+from . scene_diff import FIXED_PARTS, scene_state, diff_states, object_identities
+
+
+# Custom property holding the scene identity an object was built for
+ID_PROPERTY = 'pbr_id'
+
+# Custom property marking the objects placed by the json transform
+ROOT_PROPERTY = 'pbr_root'
+
+"""Returns the objects built for every identity, untagged objects are under None"""
+def index_objects():
+    index = {}
+    for obj in bpy.data.objects:
+        index.setdefault(obj.get(ID_PROPERTY), []).append(obj)
+    return index
+
+"""Builds one scene part with builders and tags the objects it created
+
+Created objects are the returned roots and what the part added to
+builders.hierarchy, so no part scans bpy.data.objects.
+"""
+def _build(identity, data, builders):
+    with builders.hierarchy.collect() as added:
+        if identity == 'camera':
+            roots = [builders.create_camera(data)]
+        elif identity == 'light':
+            roots = [builders.create_light(data)]
+        elif identity == 'environment':
+            builders.import_hdri(data)
+            roots = []
+        elif identity == 'floor':
+            roots = [builders.create_floor(data)]
+        else:
+            roots = builders.build_object(data)
+
+    for obj in added:
+        obj[ID_PROPERTY] = identity
+    for root in roots:
+        if root is not None:
+            root[ID_PROPERTY] = identity
+            root[ROOT_PROPERTY] = True
+
+"""Brings the Blender scene from state to the scene described by data
+
+Only parts whose json changed are touched: new and changed parts are
+built, removed ones deleted and moved objects only get a new transform
+through builders.set_obj_transform. builders is the module providing the
+create_* functions. state is updated in place as parts are built, so it
+stays accurate when a builder raises.
+"""
+def update_scene(data, state, builders, options=None):
+    new = scene_state(data, options)
+    changes = diff_states(state, new)
+    index = index_objects()
+
+    parts = dict((part, data[part]) for part in FIXED_PARTS if part in data)
+    parts.update(object_identities(data.get('objects', [])))
+
+    # Parts whose objects were removed by hand are built again
+    for identity in changes['keep'] + changes['move']:
+        if identity != 'environment' and identity not in index:
+            changes['rebuild'].append(identity)
+
+    # Remove objects of deleted or changed parts and objects not built from json
+    removed = list(index.get(None, []))
+    for identity in changes['delete'] + changes['rebuild']:
+        removed += index.get(identity, [])
+    for obj in removed:
+        bpy.data.objects.remove(obj)
+
+    entries = {}
+    state.clear()
+    state.update({'options': options, 'entries': entries})
+
+    for identity in changes['move']:
+        if identity in changes['rebuild']:
+            continue
+        for obj in index[identity]:
+            if obj.get(ROOT_PROPERTY):
+                builders.set_obj_transform(parts[identity], obj)
+        entries[identity] = new['entries'][identity]
+
+    for identity in changes['keep']:
+        if identity not in changes['rebuild']:
+            entries[identity] = new['entries'][identity]
+
+    # Build in scene order so object names stay stable
+    build = set(changes['create'] + changes['rebuild'])
+    for identity in new['entries']:
+        if identity in build:
+            _build(identity, parts[identity], builders)
+            entries[identity] = new['entries'][identity]
+
+    return changes
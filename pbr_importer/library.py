@@ -0,0 +1,87 @@
+import bpy
+
+from . uv import flip_layers_y
+from . trace import tracer
+
+
+# Bumped when the library files change what they hold, older ones are then never read
+LIBRARY_VERSION = 1
+
+# Extension of the library files
+LIBRARY_EXT = '.blend'
+
+# Custom property marking the object the glTF importer left active, returned when appending
+ROOT_PROPERTY = 'pbr_library_root'
+
+"""Returns the cache url of the library file of a glb with content hash sha256"""
+def library_url(sha256, flip):
+    return "library:{0}:{1}@{2}".format(LIBRARY_VERSION, 'flipped' if flip else 'plain', sha256)
+
+def _write_library(target, objects, root):
+    root[ROOT_PROPERTY] = True
+    try:
+        # Only the imported objects and the data they use are written, the open file is untouched
+        bpy.data.libraries.write(target, set(objects))
+    finally:
+        del root[ROOT_PROPERTY]
+
+"""Imports a glb with the glTF importer, returns its root object and every object it added
+
+The root is found among the added objects rather than from the
+selection, the active object only decides between several roots.
+"""
+def import_gltf(filepath):
+    before = set(obj.name for obj in bpy.data.objects)
+
+    with tracer.span('import_gltf', url=filepath):
+        bpy.ops.import_scene.gltf(filepath=filepath)
+
+    added = [obj for obj in bpy.data.objects if obj.name not in before]
+    roots = [obj for obj in added if obj.parent is None]
+    if len(roots) == 1:
+        return roots[0], added
+    return bpy.context.view_layer.objects.active, added
+
+"""Imports a glb and saves what it created to target, returns the root left in the scene and every object it added"""
+def _import_into_library(source, target, flip):
+    root, added = import_gltf(source)
+
+    # Same flip flip_uvs_y applies, only the root mesh
+    if flip and root.data is not None:
+        flip_layers_y(root.data.uv_layers)
+
+    _write_library(target, added, root)
+
+    return root, added
+
+"""Appends the objects of a library file to the scene collection, returns their root and every appended object"""
+def append_library(path):
+    with tracer.span('append_library', path=path):
+        with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+            data_to.objects = list(data_from.objects)
+
+    root = None
+    for obj in data_to.objects:
+        bpy.context.scene.collection.objects.link(obj)
+        if obj.get(ROOT_PROPERTY):
+            root = obj
+            del obj[ROOT_PROPERTY]
+
+    return root, list(data_to.objects)
+
+"""Adds a glb to the scene, read from its library file when one was saved, returns its root and every object added
+
+The glb at source is imported with the glTF importer only the first time
+its content is seen, flip flips the root UVs like flip_uvs_y. The result
+is saved in cache as a .blend keyed by sha256 and flip, later calls
+append it from there.
+"""
+def load_from_library(cache, source, sha256, flip):
+    imported = []
+    path = cache.make(library_url(sha256, flip), LIBRARY_EXT, lambda target: imported.append(_import_into_library(source, target, flip)))
+
+    # Built by this call, the imported objects are already in the scene
+    if len(imported) > 0:
+        return imported[0]
+
+    return append_library(path)
@@ -0,0 +1,49 @@
+import math
+
+
+# Texture maps looked up as <size>_<map> in a files dict
+TEXTURE_MAPS = ('color', 'displacement', 'normal', 'roughness')
+
+# --texture_size value choosing a variant per material
+AUTO = 'auto'
+
+# Texture variants from smallest to largest with the pixels of their longest side
+TEXTURE_SIZES = (('small', 512), ('medium', 1024), ('large', 2048))
+
+"""Returns the files key of a texture map, size is a size name or a dict of size names by map"""
+def texture_key(size, texture):
+    if isinstance(size, dict):
+        size = size.get(texture)
+    return "{0}_{1}".format(size, texture)
+
+"""Returns the pixels a texture needs to cover coverage of a width x height render"""
+def required_pixels(width, height, coverage=1.0):
+    return int(math.ceil(max(width, height) * coverage))
+
+"""Returns the texture sizes files has at least one map for, smallest first"""
+def available_sizes(files):
+    if files is None:
+        return []
+    return [name for name, pixels in TEXTURE_SIZES if any(texture_key(name, texture) in files for texture in TEXTURE_MAPS)]
+
+"""Returns the texture size a material is built with
+
+A size other than "auto" is used as is. With "auto" the smallest variant
+of files at least as large as the screen area it covers is picked, or the
+largest one when none is.
+"""
+def select_texture_size(files, size, width, height, coverage=1.0):
+    if size != AUTO:
+        return size
+
+    sizes = available_sizes(files)
+    if len(sizes) == 0:
+        # Nothing to load, any size gives the same material
+        return TEXTURE_SIZES[-1][0]
+
+    pixels = dict(TEXTURE_SIZES)
+    needed = required_pixels(width, height, coverage)
+    for name in sizes:
+        if pixels[name] >= needed:
+            return name
+    return sizes[-1]
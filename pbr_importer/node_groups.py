@@ -0,0 +1,79 @@
+import bpy
+
+
+# Name of the node group every PBR material instantiates
+PBR_GROUP_NAME = "PBR Material"
+
+# Principled BSDF inputs exposed by the group under the same name, set from material props
+SHADER_INPUTS = ('Metallic', 'Roughness', 'IOR', 'Transmission', 'Clearcoat', 'Clearcoat Roughness', 'Sheen', 'Emission', 'Normal')
+
+# Shared PBR node group, built on first use
+pbr_group = None
+
+def _is_valid(datablock):
+    if datablock is None:
+        return False
+    try:
+        datablock.name
+    except ReferenceError:
+        return False
+    return True
+
+def _expose(group, group_input, socket, name):
+    # Group input with the type and default value of socket, linked to it
+    interface = group.inputs.new(socket.bl_idname, name)
+    if hasattr(socket, 'default_value'):
+        interface.default_value = socket.default_value
+    # Hidden value sockets such as Normal fall back to their implicit value when left unlinked
+    interface.hide_value = socket.hide_value
+    group.links.new(group_input.outputs[name], socket)
+    return interface
+
+"""Builds the node group shared by all PBR materials
+
+The group holds the Principled BSDF, the MixRGB tinting the color map and
+the Displacement node. Its inputs default to the node defaults, so a
+material only sets what its props change and links the image nodes it
+uses: "Color Map", "Tint" and "Tint Factor" feed the base colour,
+"Height" and "Displacement Scale" the displacement and the Principled
+inputs are exposed under their own names. Outputs are "BSDF" and
+"Displacement".
+"""
+def build_pbr_group(name=PBR_GROUP_NAME):
+    group = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+    nodes = group.nodes
+    links = group.links
+
+    group_input = nodes.new(type='NodeGroupInput')
+    group_output = nodes.new(type='NodeGroupOutput')
+    shader = nodes.new(type='ShaderNodeBsdfPrincipled')
+    displacement_map = nodes.new(type='ShaderNodeDisplacement')
+
+    # Base colour: color map multiplied by the colour prop
+    mix_rgb = nodes.new(type='ShaderNodeMixRGB')
+    mix_rgb.blend_type = 'MULTIPLY'
+    color_map = _expose(group, group_input, mix_rgb.inputs[1], "Color Map")
+    color_map.default_value = shader.inputs["Base Color"].default_value
+    _expose(group, group_input, mix_rgb.inputs[2], "Tint")
+    _expose(group, group_input, mix_rgb.inputs[0], "Tint Factor")
+    links.new(mix_rgb.outputs["Color"], shader.inputs["Base Color"])
+
+    for input_name in SHADER_INPUTS:
+        _expose(group, group_input, shader.inputs[input_name], input_name)
+
+    _expose(group, group_input, displacement_map.inputs["Height"], "Height")
+    _expose(group, group_input, displacement_map.inputs["Scale"], "Displacement Scale")
+
+    group.outputs.new('NodeSocketShader', "BSDF")
+    group.outputs.new('NodeSocketVector', "Displacement")
+    links.new(shader.outputs["BSDF"], group_output.inputs["BSDF"])
+    links.new(displacement_map.outputs["Displacement"], group_output.inputs["Displacement"])
+
+    return group
+
+"""Returns the shared PBR node group, building it again when it was removed"""
+def get_pbr_group():
+    global pbr_group
+    if not _is_valid(pbr_group):
+        pbr_group = build_pbr_group()
+    return pbr_group
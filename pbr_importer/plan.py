@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from . lod import AUTO, TEXTURE_MAPS, select_texture_size
+from . budget import plan_texture_sizes
+from . prefetch import iter_assets
+from . signatures import material_signature, dynamic_material_signature, object_mesh_signatures
+from . scene_diff import object_identities
+from . downloader import DownloadError
+
+
+"""Returns every asset of a scene once, with its uses and cache status
+
+Each asset is a dict with its url, extension, kind, the sizes and maps it
+was resolved for, how many times the builders load it and its cache
+status. bytes is the cached size, or for missing assets the size the
+server announces when probe is set, otherwise None.
+"""
+def plan_assets(data, cache, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000), probe=False, max_workers=8):
+    assets = {}
+    for url, ext, use in iter_assets(data, texture_size, mesh_size, object_texture_size, render_size):
+        asset = assets.get((url, ext))
+        if asset is None:
+            asset = assets[(url, ext)] = {'url': url, 'ext': ext, 'kind': use['kind'], 'sizes': [], 'maps': [], 'uses': 0}
+        asset['uses'] += 1
+        if use['size'] is not None and use['size'] not in asset['sizes']:
+            asset['sizes'].append(use['size'])
+        if 'map' in use and use['map'] not in asset['maps']:
+            asset['maps'].append(use['map'])
+
+    for asset in assets.values():
+        status, entry = cache.status(asset['url'], asset['ext'])
+        asset['status'] = status
+        asset['bytes'] = entry['size'] if entry is not None else None
+
+    # Ask the servers for the size of what is not cached yet
+    missing = [asset for asset in assets.values() if asset['status'] == 'missing']
+    if probe and not cache.offline and len(missing) > 0:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(lambda asset: _probe(cache, asset), missing))
+
+    return list(assets.values())
+
+def _probe(cache, asset):
+    try:
+        asset['bytes'] = cache.downloader.content_length(asset['url'])
+    except DownloadError as e:
+        asset['error'] = str(e)
+
+"""Returns the materials a scene builds after deduplication, with the parts sharing each"""
+def plan_materials(data, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000)):
+    if object_texture_size is None:
+        object_texture_size = texture_size
+    materials = {}
+
+    def add(signature, user):
+        material = materials.get(signature)
+        if material is None:
+            material = materials[signature] = _describe_material(signature)
+            material['users'] = []
+        material['users'].append(user)
+
+    if 'floor' in data and 'files' in data['floor']:
+        files = data['floor']['files']
+        add(material_signature(files, select_texture_size(files, texture_size, *render_size), data['floor']['materialProps']), 'floor')
+
+    for identity, obj in object_identities(data.get('objects', [])):
+        if obj['type'] == 'dynamic':
+            add(dynamic_material_signature(obj['dynamicMaterialProps']), identity)
+            continue
+
+        # One material per object built, see build_object
+        files = obj['materialData'].get('files')
+        size = obj.get('textureSizes') or select_texture_size(files, object_texture_size, *render_size)
+        for key in object_mesh_signatures(obj, mesh_size):
+            add(material_signature(files, size, obj['materialData']['materialProps']), identity)
+
+    return list(materials.values())
+
+def _describe_material(signature):
+    if signature[0] == 'dynamic':
+        return {'kind': 'dynamic', 'image': signature[1], 'width': signature[2], 'height': signature[3]}
+    textures = dict((texture, url) for texture, url in zip(TEXTURE_MAPS, signature[1]) if url is not None)
+    return {'kind': 'material', 'textures': textures, 'props': dict(signature[2])}
+
+"""Returns the meshes a scene imports after instancing, with the objects sharing each"""
+def plan_meshes(data, mesh_size):
+    meshes = {}
+    for identity, obj in object_identities(data.get('objects', [])):
+        for key in object_mesh_signatures(obj, mesh_size):
+            mesh = meshes.get(key)
+            if mesh is None:
+                if key[0] == 'shape':
+                    mesh = meshes[key] = {'kind': 'shape', 'shape': key[1], 'users': []}
+                else:
+                    mesh = meshes[key] = {'kind': 'glb', 'url': key[1], 'users': []}
+            mesh['users'].append(identity)
+
+    return list(meshes.values())
+
+"""Returns the build plan of a scene, resolved like pbr_import.py would without touching bpy
+
+The plan holds the assets with their cache status, the materials after
+deduplication, the meshes after instancing and totals of what building
+the scene costs. With texture_size "auto" the textures are planned
+through the camera first, which annotates the objects of data like a
+render does.
+"""
+def build_plan(data, cache, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000), texture_budget=None, probe=False, max_workers=8):
+    plan = {
+        'options': {
+            'texture_size': texture_size,
+            'object_texture_size': object_texture_size,
+            'mesh_size': mesh_size,
+            'render_size': list(render_size),
+        },
+    }
+
+    if texture_size == AUTO:
+        plan['texture_plan'] = plan_texture_sizes(data, render_size[0], render_size[1], texture_budget)
+
+    assets = plan_assets(data, cache, texture_size, mesh_size, object_texture_size, render_size, probe, max_workers)
+    materials = plan_materials(data, texture_size, mesh_size, object_texture_size, render_size)
+    meshes = plan_meshes(data, mesh_size)
+
+    missing = [asset for asset in assets if asset['status'] == 'missing']
+    sizes = {}
+    for asset in assets:
+        for size in asset['sizes']:
+            sizes[size] = sizes.get(size, 0) + 1
+
+    plan['totals'] = {
+        'assets': len(assets),
+        'assets_by_size': sizes,
+        'cached': sum(1 for asset in assets if asset['status'] == 'cached'),
+        'stale': sum(1 for asset in assets if asset['status'] == 'stale'),
+        'missing': len(missing),
+        'cached_bytes': sum(asset['bytes'] for asset in assets if asset['status'] != 'missing'),
+        'download_bytes': sum(asset['bytes'] for asset in missing if asset['bytes'] is not None),
+        'unknown_bytes': sum(1 for asset in missing if asset['bytes'] is None),
+        'materials': len(materials),
+        'material_uses': sum(len(material['users']) for material in materials),
+        'meshes': len(meshes),
+        'mesh_uses': sum(len(mesh['users']) for mesh in meshes),
+    }
+    plan['assets'] = assets
+    plan['materials'] = materials
+    plan['meshes'] = meshes
+
+    return plan
@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from . cache import CacheMissError
+from . lod import TEXTURE_MAPS, select_texture_size, texture_key
+from . resize import fetch_resized, can_resize, thread_safe
+
+
+# Object names built from the local cache/<shape>.glb files
+PRIMITIVES = ('Sphere', 'Cube', 'Plane', 'Cylinder')
+
+"""Yields the texture maps of a files dict for the given size, a name or a dict by map"""
+def _iter_textures(files, size):
+    if files is None:
+        return
+    for texture in TEXTURE_MAPS:
+        if texture_key(size, texture) in files:
+            name = size.get(texture) if isinstance(size, dict) else size
+            yield files[texture_key(size, texture)], '.png', {'kind': 'texture', 'map': texture, 'size': name}
+
+"""Yields (url, extension, use) for every asset the scene builders will load, in build order
+
+use tells what the asset is loaded for: its kind (environment, texture,
+mesh or image), the size it was resolved for, the map of textures and the
+width and height images are scaled to.
+Urls used several times are yielded every time.
+Texture sizes go through select_texture_size with render_size, objects use
+object_texture_size when given and texture_size otherwise.
+"""
+def iter_assets(data, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000)):
+    if object_texture_size is None:
+        object_texture_size = texture_size
+
+    # The camera and light are built from plain values, only the environment is a file
+    if 'environment' in data:
+        yield data['environment'], '.pic', {'kind': 'environment', 'size': None}
+
+    # Floor textures
+    if 'floor' in data:
+        files = data['floor'].get('files')
+        yield from _iter_textures(files, select_texture_size(files, texture_size, *render_size))
+
+    for obj in data.get('objects', []):
+        # Meshes
+        if obj['type'] == 'gltf':
+            yield obj['files'][mesh_size], '.glb', {'kind': 'mesh', 'size': mesh_size}
+        elif obj['type'] == 'dynamic':
+            yield obj['files']['medium'], '.glb', {'kind': 'mesh', 'size': 'medium'}
+            props = obj['dynamicMaterialProps']
+            yield props['files'], '.png', {'kind': 'image', 'size': None, 'width': props.get('width'), 'height': props.get('height')}
+            continue
+        elif obj['name'] not in PRIMITIVES:
+            continue
+
+        # Material textures
+        files = obj['materialData'].get('files')
+        size = obj.get('textureSizes') or select_texture_size(files, object_texture_size, *render_size)
+        yield from _iter_textures(files, size)
+
+"""Returns every (url, extension) pair the scene builders will load, in build order, see iter_assets"""
+def collect_assets(data, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000)):
+    # Remove duplicates keeping the first occurrence
+    unique = {}
+    for url, ext, use in iter_assets(data, texture_size, mesh_size, object_texture_size, render_size):
+        unique.setdefault((url, ext), None)
+
+    return list(unique)
+
+"""Downloads all assets into the cache using a bounded thread pool"""
+def prefetch(assets, cache, max_workers=8):
+    paths = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {}
+        for url, ext in assets:
+            futures[(url, ext)] = executor.submit(cache.fetch, url, ext)
+
+        for key, future in futures.items():
+            try:
+                paths[key] = future.result()
+            except Exception as e:
+                failed[key] = e
+
+    # Failed downloads are retried by the scene builders, which report the error
+    for (url, ext), e in failed.items():
+        print("Cannot prefetch {0}: {1}".format(url, e))
+
+    # An offline cache cannot recover from a miss, stop before building anything
+    misses = [e for e in failed.values() if isinstance(e, CacheMissError)]
+    if len(misses) > 0:
+        raise CacheMissError("{0} assets missing from the offline cache".format(len(misses)))
+
+    return paths
+
+"""Returns the (url, extension, width, height) images loaded at a fixed size"""
+def collect_resized(data):
+    resized = []
+    for obj in data.get('objects', []):
+        if obj['type'] == 'dynamic':
+            props = obj['dynamicMaterialProps']
+            if props.get('width') is not None and props.get('height') is not None:
+                resized.append((props['files'], '.png', props['width'], props['height']))
+
+    return list(dict.fromkeys(resized))
+
+def _resize(cache, image):
+    url, ext, width, height = image
+    try:
+        fetch_resized(cache, url, ext, width, height)
+    except Exception as e:
+        # load_image retries and falls back to scaling in Blender
+        print("Cannot resize {0}: {1}".format(url, e))
+
+"""Stores the resized copies of images in the cache, see resize.fetch_resized"""
+def prefetch_resized(images, cache, max_workers=8):
+    if not can_resize():
+        return
+
+    if thread_safe():
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(lambda image: _resize(cache, image), images))
+    else:
+        # imbuf is only used from the thread running bpy
+        for image in images:
+            _resize(cache, image)
+
+"""Collects and downloads every asset of a scene before it is built"""
+def prefetch_scene(data, cache, texture_size, mesh_size, object_texture_size=None, max_workers=8, render_size=(1000, 1000), resize=True):
+    assets = collect_assets(data, texture_size, mesh_size, object_texture_size, render_size)
+    paths = prefetch(assets, cache, max_workers)
+
+    if resize:
+        prefetch_resized(collect_resized(data), cache, max_workers)
+
+    # Other processes sharing the cache see these files as recently used while the scene renders
+    cache.save()
+
+    return paths
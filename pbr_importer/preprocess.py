@@ -0,0 +1,111 @@
+import os
+import sys
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from concurrent.futures import ThreadPoolExecutor
+
+from . prefetch import iter_assets
+from . resize import Image
+
+
+# Format prepared images are stored in: uncompressed targa loads without inflating png data
+PREPARED_EXT = '.tga'
+
+# Colour space each texture map is loaded with by build_material, None keeps sRGB
+MAP_COLORSPACES = {'color': None, 'displacement': None, 'normal': 'Non-Color', 'roughness': 'Non-Color'}
+
+# Pixel mode of the prepared file by map, roughness only needs one channel
+MAP_MODES = {'roughness': 'L'}
+
+# Pillow modes of 16 bit grayscale images
+HIGH_BIT_MODES = ('I;16', 'I;16L', 'I;16B', 'I;16N')
+
+"""Returns True when images can be prepared, Pillow decodes them outside Blender"""
+def can_preprocess():
+    return Image is not None
+
+"""Decodes source, fits it to width x height when both are given and writes it as targa
+
+Runs in the worker processes, so it only uses Pillow. 16 bit images are
+scaled down to 8 bits rather than clipped, images of other high bit
+depths raise ValueError and load_image reads the downloaded file.
+"""
+def prepare_image(source, target, width=None, height=None, mode=None):
+    with Image.open(source) as image:
+        image.load()
+
+        # Older Pillow versions open 16 bit PNGs as I, PNG has no wider integers
+        if image.mode in HIGH_BIT_MODES or (image.mode == 'I' and image.format == 'PNG'):
+            # Pillow clips values above 255 when converting 16 bit integers to 8 bits
+            image = image.convert('I').point(lambda value: value * (255 / 65535)).convert('L')
+        elif image.mode in ('I', 'F'):
+            raise ValueError("Cannot prepare {0} images".format(image.mode))
+
+        if width is not None and height is not None:
+            image = image.resize((int(width), int(height)), Image.BILINEAR)
+
+        if mode is not None:
+            image = image.convert(mode)
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        image.save(target, format='TGA')
+
+"""Returns the images load_image will read for a scene as prepare jobs
+
+Each job is a dict with the load_image key (url, width, height, colour
+space) under "key" and the prepare_image arguments. The images are the
+ones prefetch.iter_assets lists. Environment maps are left out, Pillow
+cannot decode Radiance files.
+"""
+def collect_images(data, texture_size, mesh_size, object_texture_size=None, render_size=(1000, 1000)):
+    jobs = {}
+    for url, ext, use in iter_assets(data, texture_size, mesh_size, object_texture_size, render_size):
+        if use['kind'] == 'texture':
+            key = (url, None, None, MAP_COLORSPACES[use['map']])
+            jobs.setdefault(key, {'key': key, 'mode': MAP_MODES.get(use['map'])})
+        elif use['kind'] == 'image':
+            key = (url, use['width'], use['height'], None)
+            jobs.setdefault(key, {'key': key, 'width': use['width'], 'height': use['height']})
+
+    return list(jobs.values())
+
+def _variant_name(job):
+    return "prepared-{0}x{1}-{2}".format(job.get('width'), job.get('height'), job.get('mode'))
+
+def _pool(processes):
+    # Forked workers never run the calling script again, spawned ones would import it and its modules anew.
+    # The pool forks all of them up front, before any thread is started.
+    if 'fork' in multiprocessing.get_all_start_methods() and sys.platform != 'darwin':
+        return multiprocessing.get_context('fork').Pool(processes)
+    # Pillow releases the GIL while decoding and resizing
+    return ThreadPool(processes)
+
+"""Prepares the images of jobs in a process pool and stores them in the cache
+
+Returns a dict from load_image key to the prepared file. Jobs that fail
+are printed and left out, load_image then reads the downloaded file.
+"""
+def preprocess_images(jobs, cache, max_workers=None):
+    if not can_preprocess() or len(jobs) == 0:
+        return {}
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    prepared = {}
+    with _pool(max(1, max_workers)) as pool:
+        def build(job):
+            url = job['key'][0]
+            arguments = (job.get('width'), job.get('height'), job.get('mode'))
+            return cache.derive(url, '.png', _variant_name(job), lambda source, target: pool.apply(prepare_image, (source, target) + arguments), PREPARED_EXT)
+
+        # Threads only wait on the cache locks and the worker processes
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as threads:
+            futures = [(job, threads.submit(build, job)) for job in jobs]
+            for job, future in futures:
+                try:
+                    prepared[job['key']] = future.result()
+                except Exception as e:
+                    print("Cannot prepare {0}: {1}".format(job['key'][0], e))
+
+    return prepared
@@ -0,0 +1,79 @@
+import bpy
+import bmesh
+
+from . uv import flip_layers_y
+
+
+# Name of the UV layer the add mesh operators create
+UV_LAYER_NAME = "UVMap"
+
+"""Links a new object holding data to the scene collection and returns it"""
+def add_object(name, data):
+    obj = bpy.data.objects.new(name, data)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+def _add_mesh(name, build, smooth):
+    bm = bmesh.new()
+    try:
+        bm.loops.layers.uv.new(UV_LAYER_NAME)
+        build(bm)
+        if smooth:
+            for face in bm.faces:
+                face.smooth = True
+
+        mesh = bpy.data.meshes.new(name)
+        bm.to_mesh(mesh)
+    finally:
+        bm.free()
+
+    return add_object(name, mesh)
+
+"""Adds a plane of size metres with UVs, the mesh bpy.ops.mesh.primitive_plane_add builds"""
+def add_plane(name, size, smooth = False):
+    return _add_mesh(name, lambda bm: bmesh.ops.create_grid(bm, x_segments=1, y_segments=1, size=size / 2, calc_uvs=True), smooth)
+
+"""Adds a UV sphere with UVs, the mesh bpy.ops.mesh.primitive_uv_sphere_add builds"""
+def add_uv_sphere(name, segments, ring_count, radius, smooth = False):
+    return _add_mesh(name, lambda bm: bmesh.ops.create_uvsphere(bm, u_segments=segments, v_segments=ring_count, radius=radius, calc_uvs=True), smooth)
+
+"""Adds a capped cylinder with UVs, the mesh bpy.ops.mesh.primitive_cylinder_add builds"""
+def add_cylinder(name, radius, depth, vertices = 32, smooth = False):
+    return _add_mesh(name, lambda bm: bmesh.ops.create_cone(bm, cap_ends=True, cap_tris=False, segments=vertices, radius1=radius, radius2=radius, depth=depth, calc_uvs=True), smooth)
+
+"""Adds a solidify modifier with the defaults of bpy.ops.object.modifier_add"""
+def add_solidify(obj):
+    return obj.modifiers.new(name="Solidify", type='SOLIDIFY')
+
+"""Adds a box mesh from its 8 corners, with the UV layer uv_layers.new gives a mesh without UVs"""
+def add_box(name, vertices):
+    faces = [(0,1,3,2),(0,2,6,4),(4,6,7,5),(1,3,7,5),(3,2,6,7),(0,1,5,4)]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+
+    mesh.uv_layers.new(name=name)
+
+    return add_object(name, mesh)
+
+"""Adds the mesh of a primitive shape built in Blender, for builds without the <shape>.glb files
+
+Boxes get their UVs flipped like the glb objects, the sphere and
+cylinder keep the UVs bmesh gives them.
+"""
+def add_shape(shape):
+    if shape == 'sphere':
+        return add_uv_sphere("Sphere", segments = 64, ring_count = 64, radius = 4.5, smooth = True)
+    if shape == 'cylinder':
+        return add_cylinder("Cylinder", radius = 4, depth = 12, smooth = True)
+
+    if shape == 'cube':
+        box = add_box("Cube", [(-2.5, -3, -2.5), (2.5, -3, -2.5), (-2.5, -3, 2.5), (2.5, -3, 2.5), (-2.5, 3, -2.5), (2.5, 3, -2.5), (-2.5, 3, 2.5), (2.5, 3, 2.5)])
+    elif shape == 'plane':
+        box = add_box("Plane", [(-1.5, -.05, -2), (1.5, -.05, -2), (-1.5, -.05, 2), (1.5, -.05, 2), (-1.5, .05, -2), (1.5, .05, -2), (-1.5, .05, 2), (1.5, .05, 2)])
+    else:
+        raise NameError("Unknown shape {0}".format(shape))
+
+    flip_layers_y(box.data.uv_layers)
+    return box
@@ -0,0 +1,46 @@
+try:
+    # Pillow resizes outside Blender and releases the GIL while doing so
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    # Blender's image buffer module, available inside Blender without bpy.data
+    import imbuf
+except ImportError:
+    imbuf = None
+
+
+class ResizeUnavailable(RuntimeError):
+    """Raised when no image library can resize, callers fall back to Image.scale"""
+
+
+"""Returns True when images can be resized outside bpy.data"""
+def can_resize():
+    return Image is not None or imbuf is not None
+
+"""Returns True when resize_image can run in worker threads"""
+def thread_safe():
+    return Image is not None
+
+"""Writes source resized to width x height into target, in the format of source"""
+def resize_image(source, target, width, height):
+    if Image is not None:
+        with Image.open(source) as image:
+            file_format = image.format
+            resized = image.resize((int(width), int(height)), Image.BILINEAR)
+        resized.save(target, format=file_format)
+    elif imbuf is not None:
+        image = imbuf.load(source)
+        try:
+            image.resize((int(width), int(height)), method='BILINEAR')
+            imbuf.write(image, filepath=target)
+        finally:
+            image.free()
+    else:
+        raise ResizeUnavailable("Neither Pillow nor imbuf is available to resize images")
+
+"""Returns the cache path of url resized to width x height, resizing it on first use"""
+def fetch_resized(cache, url, ext, width, height):
+    name = "{0}x{1}".format(int(width), int(height))
+    return cache.derive(url, ext, name, lambda source, target: resize_image(source, target, width, height))
@@ -0,0 +1,82 @@
+import json
+import hashlib
+
+
+# Scene parts built once per scene, identified by their json key
+FIXED_PARTS = ('camera', 'light', 'environment', 'floor')
+
+# Object keys that only change the transform of an object
+TRANSFORM_KEYS = ('position', 'rotation', 'scale')
+
+"""Returns a stable hash of a json subtree"""
+def subtree_hash(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+"""Returns (identity, data) for every object of a scene
+
+Objects with an "id" or "uuid" keep it as identity, the others are
+identified by their name and how many objects before them share it.
+"""
+def object_identities(objects):
+    identities = []
+    seen = {}
+    for obj in objects:
+        if 'id' in obj:
+            identity = 'id:' + str(obj['id'])
+        elif 'uuid' in obj:
+            identity = 'id:' + str(obj['uuid'])
+        else:
+            count = seen.get(obj['name'], 0)
+            seen[obj['name']] = count + 1
+            identity = "{0}#{1}".format(obj['name'], count)
+        identities.append((identity, obj))
+    return identities
+
+"""Returns the state index of a scene: content and transform hashes per identity"""
+def scene_state(data, options=None):
+    entries = {}
+
+    for part in FIXED_PARTS:
+        if part in data:
+            entries[part] = {'content': subtree_hash(data[part]), 'transform': None}
+
+    for identity, obj in object_identities(data.get('objects', [])):
+        content = dict((key, value) for key, value in obj.items() if key not in TRANSFORM_KEYS)
+        transform = dict((key, obj.get(key)) for key in TRANSFORM_KEYS)
+        entries[identity] = {'content': subtree_hash(content), 'transform': subtree_hash(transform)}
+
+    return {'options': options, 'entries': entries}
+
+"""Compares two scene states
+
+Returns a dict of identity lists: "create" for new identities, "delete" for
+removed ones, "rebuild" when the content changed, "move" when only the
+transform changed and "keep" for the unchanged ones. A change of options
+rebuilds everything.
+"""
+def diff_states(old, new):
+    result = {'create': [], 'delete': [], 'rebuild': [], 'move': [], 'keep': []}
+
+    old_entries = {}
+    if old and old.get('options') == new.get('options'):
+        old_entries = old['entries']
+    elif old:
+        result['delete'] = list(old['entries'])
+
+    for identity, entry in new['entries'].items():
+        previous = old_entries.get(identity)
+        if previous is None:
+            result['create'].append(identity)
+        elif previous['content'] != entry['content']:
+            result['rebuild'].append(identity)
+        elif previous['transform'] != entry['transform']:
+            result['move'].append(identity)
+        else:
+            result['keep'].append(identity)
+
+    for identity in old_entries:
+        if identity not in new['entries']:
+            result['delete'].append(identity)
+
+    return result
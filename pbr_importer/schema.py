@@ -0,0 +1,253 @@
+from . prefetch import PRIMITIVES
+
+
+"""Raised when a scene does not match the schema, holds every error found"""
+class SceneValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__("{0} scene errors:\n{1}".format(len(errors), "\n".join(errors)))
+        self.errors = errors
+
+
+# Python types accepted for each schema type, bool is excluded from the numbers
+TYPES = {
+    'object': (dict,),
+    'array': (list,),
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'null': (type(None),),
+}
+
+VECTOR3 = {'type': 'array', 'items': {'type': 'number'}, 'minItems': 3, 'maxItems': 3}
+
+POINT = {'type': 'object', 'required': ['x', 'y', 'z'], 'properties': {
+    'x': {'type': 'number'}, 'y': {'type': 'number'}, 'z': {'type': 'number'},
+}}
+
+UV_VECTOR = {'type': 'object', 'required': ['x', 'y'], 'properties': {
+    'x': {'type': 'number'}, 'y': {'type': 'number'},
+}}
+
+# Texture and glb urls by "<size>_<map>" or mesh size
+FILES = {'type': 'object', 'additionalProperties': {'type': 'string'}}
+
+MATERIAL_PROPS = {'type': 'object', 'properties': {
+    'clearcoat': {'type': 'number'},
+    'clearcoatRoughness': {'type': 'number'},
+    'ior': {'type': 'number'},
+    'metalness': {'type': 'number'},
+    'transmission': {'type': 'number'},
+    'sheen': {'type': 'number'},
+    'roughness': {'type': 'number'},
+    'displacementScale': {'type': 'number'},
+    'textureRepeat': {'type': ['number', 'null']},
+    'color': {'type': ['integer', 'string']},
+    'emissive': {'type': ['integer', 'string']},
+}}
+
+CAMERA = {'type': 'object', 'required': ['position', 'rotation', 'object'], 'properties': {
+    'position': POINT,
+    'rotation': {'type': 'object', 'required': ['_x', '_y', '_z'], 'properties': {
+        '_x': {'type': 'number'}, '_y': {'type': 'number'}, '_z': {'type': 'number'},
+    }},
+    'object': {'type': 'object', 'required': ['fov', 'focus'], 'properties': {
+        'fov': {'type': 'number'}, 'focus': {'type': 'number'},
+    }},
+}}
+
+LIGHT = {'type': 'object', 'required': ['position', 'object'], 'properties': {
+    'position': POINT,
+    'object': {'type': 'object', 'required': ['intensity', 'color', 'name'], 'properties': {
+        'intensity': {'type': 'number'}, 'color': {'type': 'integer'}, 'name': {'type': 'string'},
+    }},
+}}
+
+FLOOR = {'type': 'object', 'properties': {
+    'name': {'type': 'string'},
+    'files': FILES,
+    'materialProps': MATERIAL_PROPS,
+}}
+
+# Every object needs a name and a type, even the ones no builder handles
+OBJECT = {'type': 'object', 'required': ['name', 'type'], 'properties': {
+    'name': {'type': 'string'}, 'type': {'type': 'string'},
+}}
+
+# Objects built by build_object: primitives, gltf and dynamic objects
+BUILT_OBJECT = {'type': 'object', 'required': ['position', 'rotation', 'scale', 'materialData'], 'properties': {
+    'position': VECTOR3,
+    'rotation': VECTOR3,
+    'scale': VECTOR3,
+    'textureSizes': {'type': 'object', 'additionalProperties': {'type': 'string'}},
+    'materialData': {'type': 'object', 'required': ['materialProps'], 'properties': {
+        'files': FILES,
+        'materialProps': MATERIAL_PROPS,
+    }},
+}}
+
+# Width and height may be null but are read by build_dynamic_image_material
+DYNAMIC_MATERIAL_PROPS = {'type': 'object', 'required': ['files', 'width', 'height', 'repeat'], 'properties': {
+    'files': {'type': 'string'},
+    'width': {'type': ['number', 'null']},
+    'height': {'type': ['number', 'null']},
+    'repeat': {'type': [UV_VECTOR, 'null']},
+    'offset': UV_VECTOR,
+}}
+
+def _type_name(value):
+    for name, types in TYPES.items():
+        if isinstance(value, types) and not (isinstance(value, bool) and name != 'boolean'):
+            return name
+    return type(value).__name__
+
+"""Returns a JSON path such as objects[3].materialData.materialProps"""
+def format_path(path):
+    text = ''
+    for part in path:
+        if isinstance(part, int):
+            text += "[{0}]".format(part)
+        elif text:
+            text += '.' + part
+        else:
+            text = part
+    return text or '$'
+
+"""Compiles a schema into a check(value, path, errors) function
+
+A schema is a dict with a "type" (a name, a nested schema or a list of
+them), "required" and "properties" for objects, "additionalProperties" for
+the values of other keys, "items", "minItems" and "maxItems" for arrays.
+Schemas are walked once here, checking a value only runs the closures.
+"""
+def compile_schema(schema):
+    if isinstance(schema, str):
+        schema = {'type': schema}
+
+    kinds = schema.get('type')
+    if not isinstance(kinds, list):
+        kinds = [kinds]
+
+    names = [kind for kind in kinds if isinstance(kind, str)]
+    nested = [compile_schema(kind) for kind in kinds if isinstance(kind, dict)]
+    accepted = tuple(t for name in names for t in TYPES[name])
+    allow_bool = 'boolean' in names
+    expected = " or ".join(names + ['object'] * len(nested))
+
+    required = schema.get('required', [])
+    properties = [(key, compile_schema(value)) for key, value in schema.get('properties', {}).items()]
+    known = set(schema.get('properties', {}))
+    additional = compile_schema(schema['additionalProperties']) if 'additionalProperties' in schema else None
+    items = compile_schema(schema['items']) if 'items' in schema else None
+    min_items = schema.get('minItems')
+    max_items = schema.get('maxItems')
+
+    def check(value, path, errors):
+        if isinstance(value, accepted) and (allow_bool or not isinstance(value, bool)):
+            pass
+        elif len(nested) > 0 and isinstance(value, dict):
+            for check_nested in nested:
+                check_nested(value, path, errors)
+            return
+        else:
+            errors.append("{0}: expected {1}, got {2}".format(format_path(path), expected, _type_name(value)))
+            return
+
+        if isinstance(value, dict):
+            for key in required:
+                if key not in value:
+                    errors.append("{0}: missing".format(format_path(path + (key,))))
+            for key, check_property in properties:
+                if key in value:
+                    check_property(value[key], path + (key,), errors)
+            if additional is not None:
+                for key, item in value.items():
+                    if key not in known:
+                        additional(item, path + (key,), errors)
+
+        if isinstance(value, list):
+            if min_items is not None and len(value) < min_items:
+                errors.append("{0}: expected at least {1} items, got {2}".format(format_path(path), min_items, len(value)))
+            if max_items is not None and len(value) > max_items:
+                errors.append("{0}: expected at most {1} items, got {2}".format(format_path(path), max_items, len(value)))
+            if items is not None:
+                for i, item in enumerate(value):
+                    items(item, path + (i,), errors)
+
+    return check
+
+_check_object = compile_schema(OBJECT)
+_check_built_object = compile_schema(BUILT_OBJECT)
+_check_dynamic_props = compile_schema(DYNAMIC_MATERIAL_PROPS)
+_check_files = compile_schema(FILES)
+
+# Fixed scene parts, all required, the objects are checked one by one with check_object
+SCENE_PARTS = {
+    'camera': compile_schema(CAMERA),
+    'light': compile_schema(LIGHT),
+    'environment': compile_schema('string'),
+    'floor': compile_schema(FLOOR),
+    'objects': compile_schema('array'),
+}
+
+"""Checks one entry of the scene objects, appending its errors"""
+def check_object(obj, index, mesh_size, errors):
+    path = ('objects', index)
+    count = len(errors)
+    _check_object(obj, path, errors)
+    if len(errors) > count:
+        return
+
+    built = obj['name'] in PRIMITIVES or obj['type'] in ('gltf', 'dynamic')
+    if built:
+        _check_built_object(obj, path, errors)
+
+    # Mesh file read by import_glb or import_dynamic_glb
+    size = {'gltf': mesh_size, 'dynamic': 'medium'}.get(obj['type'])
+    if size is not None:
+        if 'files' not in obj:
+            errors.append("{0}: missing".format(format_path(path + ('files',))))
+        else:
+            _check_files(obj['files'], path + ('files',), errors)
+            if isinstance(obj['files'], dict) and size not in obj['files']:
+                errors.append("{0}: missing".format(format_path(path + ('files', size))))
+
+    if obj['type'] == 'dynamic':
+        props = obj.get('dynamicMaterialProps')
+        if props is None:
+            errors.append("{0}: missing".format(format_path(path + ('dynamicMaterialProps',))))
+        else:
+            _check_dynamic_props(props, path + ('dynamicMaterialProps',), errors)
+            if isinstance(props, dict) and props.get('repeat') is not None and 'offset' not in props:
+                errors.append("{0}: missing".format(format_path(path + ('dynamicMaterialProps', 'offset'))))
+
+"""Checks a top level member of a scene, appending its errors"""
+def check_part(key, value, errors):
+    if key in SCENE_PARTS:
+        SCENE_PARTS[key](value, (key,), errors)
+
+    # create_floor only reads the material props next to files
+    if key == 'floor' and isinstance(value, dict) and 'files' in value and 'materialProps' not in value:
+        errors.append("{0}: missing".format(format_path(('floor', 'materialProps'))))
+
+"""Appends a missing error for every scene part not in keys"""
+def check_required_parts(keys, errors):
+    for key in SCENE_PARTS:
+        if key not in keys:
+            errors.append("{0}: missing".format(format_path((key,))))
+
+"""Returns every error of a loaded scene, an empty list when it is valid"""
+def validate_scene(data, mesh_size):
+    errors = []
+    if not isinstance(data, dict):
+        return ["$: expected object, got {0}".format(_type_name(data))]
+
+    for key, value in data.items():
+        if key == 'objects' and isinstance(value, list):
+            for index, obj in enumerate(value):
+                check_object(obj, index, mesh_size, errors)
+        else:
+            check_part(key, value, errors)
+    check_required_parts(data, errors)
+
+    return errors
@@ -0,0 +1,86 @@
+import json
+
+from . lod import TEXTURE_MAPS, texture_key
+
+
+# Numeric material props read by create_material
+MATERIAL_PROPS = ('clearcoat', 'clearcoatRoughness', 'ior', 'metalness', 'transmission', 'sheen')
+
+# Props holding an int colour, string colours are ignored by create_material
+COLOR_PROPS = ('color', 'emissive')
+
+# Digits kept when comparing float props
+PRECISION = 6
+
+def _normalize(value):
+    if isinstance(value, float):
+        return round(value, PRECISION)
+    return value
+
+"""Returns a hashable signature of the material create_material builds
+
+Two materials with the same signature render identically: it holds the
+texture url of every map at size and the props create_material reads,
+leaving out the ones that have no effect.
+"""
+def material_signature(files, size, materialProps):
+    textures = []
+    for texture in TEXTURE_MAPS:
+        url = None
+        if files is not None and texture_key(size, texture) in files:
+            url = files[texture_key(size, texture)]
+        textures.append(url)
+    color, displacement, normal, roughness = textures
+
+    props = []
+    for key in MATERIAL_PROPS:
+        if key in materialProps:
+            props.append((key, _normalize(materialProps[key])))
+    for key in COLOR_PROPS:
+        if key in materialProps and not type(materialProps[key]) == str:
+            props.append((key, materialProps[key]))
+
+    # Props only used next to or instead of a texture
+    if displacement is not None and 'displacementScale' in materialProps:
+        props.append(('displacementScale', _normalize(materialProps['displacementScale'])))
+    if roughness is None and 'roughness' in materialProps:
+        props.append(('roughness', _normalize(materialProps['roughness'])))
+
+    return ('material', tuple(textures), tuple(props))
+
+"""Returns a hashable signature of the material create_dynamic_image_material builds"""
+def dynamic_material_signature(props):
+    return ('dynamic', props['files'], props.get('width'), props.get('height'))
+
+# Object names built from the local cache/<shape>.glb files and their shape
+PRIMITIVE_SHAPES = {'Sphere': 'sphere', 'Cube': 'cube', 'Plane': 'plane', 'Cylinder': 'cylinder'}
+
+def _uv_key(value):
+    return json.dumps(value, sort_keys=True)
+
+"""Returns the key under which the builders import a glb of an object once
+
+kind is "shape" for the primitives read from cache/<shape>.glb, "gltf" or
+"dynamic". Later objects with the same key share its mesh data, so the key
+holds the file and the UV changes applied to the shared mesh: the y flip
+and the texture repeat and offsets.
+"""
+def mesh_signature(kind, data, mesh_size):
+    props = data['materialData']['materialProps'] if 'materialData' in data else {}
+    repeat = props.get('textureRepeat')
+
+    if kind == 'shape':
+        return ('shape', PRIMITIVE_SHAPES[data['name']], True, _uv_key(repeat))
+    if kind == 'gltf':
+        return ('glb', data['files'][mesh_size], len(props) > 0, _uv_key(repeat))
+    dynamic = data['dynamicMaterialProps']
+    return ('glb', data['files']['medium'], False, _uv_key([repeat, dynamic.get('repeat'), dynamic.get('offset')]))
+
+"""Returns the mesh keys of every glb build_object imports for an object"""
+def object_mesh_signatures(data, mesh_size):
+    keys = []
+    if data['name'] in PRIMITIVE_SHAPES:
+        keys.append(mesh_signature('shape', data, mesh_size))
+    if data['type'] in ('gltf', 'dynamic'):
+        keys.append(mesh_signature(data['type'], data, mesh_size))
+    return keys
@@ -0,0 +1,62 @@
+from . cache import AssetCache
+from . lod import AUTO
+from . scene_diff import subtree_hash
+
+
+# Bumped when the builders change what they put in a scene, older snapshots are then never opened
+SNAPSHOT_VERSION = 1
+
+# Extension of the saved scenes
+SNAPSHOT_EXT = '.blend'
+
+"""Returns the options a built scene depends on besides its json
+
+Textures and meshes depend on the asset sizes. With texture_size "auto"
+they also depend on the render size and texture budget the plan was made
+for. The Blender version is included because older versions cannot open
+files saved by newer ones.
+"""
+def snapshot_options(texture_size, mesh_size, width, height, texture_budget, blender_version):
+    options = {'texture_size': texture_size, 'mesh_size': mesh_size, 'blender': blender_version}
+    if texture_size == AUTO:
+        options.update(width=width, height=height, texture_budget=texture_budget)
+    return options
+
+"""Returns the key of the snapshot of a scene built with options, before any planning touches data"""
+def snapshot_key(data, options):
+    return subtree_hash({'version': SNAPSHOT_VERSION, 'options': options, 'scene': data})
+
+def _snapshot_url(key):
+    return "snapshot:{0}".format(key)
+
+
+class SnapshotCache:
+    """Built scenes saved as .blend files, keyed by snapshot_key.
+
+    Snapshots are kept in an offline AssetCache of their own, so they are
+    written atomically, shared between processes and evicted least
+    recently used first once the folder grows past max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.cache = AssetCache(path, max_bytes=max_bytes, offline=True)
+
+    def find(self, key):
+        """Returns the path of the snapshot saved under key, None when there is none"""
+        url = _snapshot_url(key)
+        if self.cache.lookup(url, SNAPSHOT_EXT) is None:
+            return None
+        self.cache.touch(url, SNAPSHOT_EXT)
+        return self.cache.filename(url, SNAPSHOT_EXT)
+
+    def store(self, key, save):
+        """Saves the snapshot of key with save(path), replacing an older one, and returns its path"""
+        return self.cache.put(_snapshot_url(key), SNAPSHOT_EXT, save)
+
+    def discard(self, key):
+        """Removes the snapshot of key"""
+        self.cache.discard(_snapshot_url(key), SNAPSHOT_EXT)
+
+    def close(self):
+        """Flushes pending access times to the index"""
+        self.cache.close()
@@ -0,0 +1,134 @@
+import json
+
+from . schema import SceneValidationError, check_object, check_part, check_required_parts
+
+
+# Characters read from the scene file at a time
+CHUNK_SIZE = 1 << 20
+
+# Top level array whose entries are decoded one at a time
+STREAMED_KEY = 'objects'
+
+# Characters a number can go on with in the next chunk
+NUMBER_CHARS = '0123456789+-.eE'
+
+_decoder = json.JSONDecoder()
+
+class _Reader:
+    """Buffered view of a text file that decodes one JSON value at a time"""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        # Drop what was consumed so the buffer only holds the value being decoded
+        if self.pos > 0:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def peek(self):
+        """Returns the next non whitespace character, or '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected '{0}' at character {1} of the scene, got '{2}'".format(char, self.pos, self.peek()))
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next value, reading more of the file until it is complete"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number ending with the buffer, or with the start of an exponent or fraction, may go on in the next chunk
+                number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self.eof or not (number and self.buffer[end:].strip(NUMBER_CHARS) == ''):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+"""Yields (path, value) pairs for the top level members of a scene file
+
+Members are yielded as ((key,), value) in file order. The objects array is
+not decoded at once: it is yielded as (("objects",), []) followed by one
+(("objects", index), object) pair per entry, so large scenes are never
+held as a single string.
+"""
+def iter_scene(path, chunk_size=CHUNK_SIZE):
+    with open(path, mode='r') as file:
+        reader = _Reader(file, chunk_size)
+        reader.expect('{')
+        first = True
+        while reader.peek() != '}':
+            if not first:
+                reader.expect(',')
+            first = False
+
+            key = reader.value()
+            reader.expect(':')
+
+            if key == STREAMED_KEY and reader.peek() == '[':
+                yield (key,), []
+                reader.expect('[')
+                index = 0
+                while reader.peek() != ']':
+                    if index > 0:
+                        reader.expect(',')
+                    yield (key, index), reader.value()
+                    index += 1
+                reader.expect(']')
+            else:
+                yield (key,), reader.value()
+        reader.expect('}')
+
+        if reader.peek() != '':
+            raise ValueError("Extra data after the scene at character {0}".format(reader.pos))
+
+"""Yields the entries of the objects array of a scene file one by one"""
+def iter_objects(path, chunk_size=CHUNK_SIZE):
+    for key, value in iter_scene(path, chunk_size):
+        if len(key) == 2:
+            yield value
+
+"""Reads and validates a scene file
+
+Every member is checked against the schema as it is decoded and all
+errors are raised together as a SceneValidationError, before any asset is
+downloaded or built.
+"""
+def load_scene(path, mesh_size, chunk_size=CHUNK_SIZE):
+    data = {}
+    errors = []
+
+    for key, value in iter_scene(path, chunk_size):
+        if len(key) == 2:
+            check_object(value, key[1], mesh_size, errors)
+            data[key[0]].append(value)
+        else:
+            check_part(key[0], value, errors)
+            data[key[0]] = value
+    check_required_parts(data, errors)
+
+    if len(errors) > 0:
+        raise SceneValidationError(errors)
+
+    return data
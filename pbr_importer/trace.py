@@ -0,0 +1,123 @@
+import os
+import csv
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+
+# Trace formats write_trace knows, with the suffix of their file
+TRACE_FORMATS = {'json': '.trace.json', 'csv': '.trace.csv', 'chrome': '.chrome.json'}
+
+class Tracer:
+    """Records timed spans and counters of the stages of a render
+
+    Disabled tracers keep nothing, so library code can always call span()
+    and count(). Spans from several threads are recorded with their thread.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forgets every span and counter, times restart from now"""
+        with self.lock:
+            self.spans = []
+            self.counters = {}
+            self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **args):
+        """Times the with block, yields its args dict so the block can add results"""
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            self.spans.append({
+                'name': name,
+                'start': start - self.origin,
+                'seconds': end - start,
+                'thread': threading.get_ident(),
+                'args': args,
+            })
+
+    def count(self, name, value=1):
+        """Adds value to a counter"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stages(self):
+        """Returns count, total and max seconds of the spans by name"""
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span['name'], {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += span['seconds']
+            stage['max_seconds'] = max(stage['max_seconds'], span['seconds'])
+        return stages
+
+    def write_json(self, path):
+        with open(path, mode='w') as file:
+            json.dump({'stages': self.stages(), 'counters': self.counters, 'spans': self.spans}, file, indent=1, default=str)
+
+    def write_csv(self, path):
+        with open(path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['name', 'start', 'seconds', 'thread', 'args'])
+            for span in self.spans:
+                writer.writerow([span['name'], "{0:.6f}".format(span['start']), "{0:.6f}".format(span['seconds']), span['thread'], json.dumps(span['args'], default=str)])
+
+    def write_chrome(self, path):
+        """Writes the Chrome trace event format read by chrome://tracing and Perfetto"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                'name': span['name'],
+                'cat': 'pbr',
+                'ph': 'X',
+                'ts': span['start'] * 1e6,
+                'dur': span['seconds'] * 1e6,
+                'pid': pid,
+                'tid': span['thread'],
+                'args': span['args'],
+            })
+        end = max([span['start'] + span['seconds'] for span in self.spans] + [0])
+        for name, value in self.counters.items():
+            events.append({'name': name, 'ph': 'C', 'ts': end * 1e6, 'pid': pid, 'args': {name: value}})
+
+        with open(path, mode='w') as file:
+            json.dump({'traceEvents': events}, file, default=str)
+
+"""Decorator timing every call of a function as a span of the shared tracer"""
+def traced(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+"""Writes the trace in each format, next to base_path, returns the written paths"""
+def write_trace(tracer, base_path, formats):
+    paths = []
+    for name in formats:
+        path = base_path + TRACE_FORMATS[name]
+        getattr(tracer, 'write_' + name)(path)
+        paths.append(path)
+    return paths
+
+
+# Tracer shared by the pipeline stages, enabled by pbr_import.py
+tracer = Tracer()
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+"""Returns the UVs of a layer as a (loops, 2) float32 array, read with one foreach_get"""
+def read_uvs(layer):
+    uvs = np.empty(len(layer.data) * 2, dtype=np.float32)
+    layer.data.foreach_get('uv', uvs)
+    return uvs.reshape(-1, 2)
+
+"""Writes a (loops, 2) array to the UVs of a layer with one foreach_set"""
+def write_uvs(layer, uvs):
+    layer.data.foreach_set('uv', np.ascontiguousarray(uvs, dtype=np.float32).ravel())
+
+"""Returns uvs scaled around pivot
+
+Math is done in double precision and rounded to float32 once, like the
+per-loop assignments it replaces, so results match them exactly.
+"""
+def transform_uvs(uvs, scale=(1, 1), pivot=(0, 0)):
+    result = uvs.astype(np.float64)
+    for axis in range(2):
+        result[:, axis] = pivot[axis] + scale[axis] * (result[:, axis] - pivot[axis])
+    return result.astype(np.float32)
+
+"""Scales the UVs of a layer around pivot"""
+def scale_layer(layer, scale, pivot):
+    write_uvs(layer, transform_uvs(read_uvs(layer), scale, pivot))
+
+"""Returns uvs flipped on y and moved back up so y starts at 0, the flip and
+normalize of flip_uvs_y fused: y becomes max(y) - y
+"""
+def flip_normalize_y(uvs):
+    result = uvs.astype(np.float64)
+    if len(result) > 0:
+        result[:, 1] = result[:, 1].max() - result[:, 1]
+    return result.astype(np.float32)
+
+"""Flips the y axis of every UV layer, each one within its own extent
+
+One read and one write per layer.
+"""
+def flip_layers_y(layers):
+    for layer in layers:
+        write_uvs(layer, flip_normalize_y(read_uvs(layer)))
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the pbr_importer package and the benchmark fakes importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from pbr_importer.budget import GLB_EXTENT, PLAN_KEY, camera_view, plan_texture_sizes, projected_pixels
+
+
+def make_camera(fov=50, position=(0, 0, 0), rotation=(0, 0, 0)):
+    return {
+        'position': dict(zip('xyz', position)),
+        'rotation': dict(zip(('_x', '_y', '_z'), rotation)),
+        'object': {'fov': fov, 'focus': 10},
+    }
+
+def make_object(name, type, position, n, scale=1):
+    files = dict(("{0}_color".format(size), "https://assets.example.com/{0}/{1}.png".format(size, n)) for size in ('small', 'medium', 'large'))
+    return {'name': name, 'type': type, 'position': list(position), 'rotation': [0, 0, 0], 'scale': [scale] * 3,
+            'materialData': {'files': files, 'materialProps': {}}}
+
+def assert_close(a, b):
+    assert a == pytest.approx(b, abs=1e-9)
+
+
+def test_camera_view_looks_down_the_json_z_axis():
+    position, right, up, forward, tan_half = camera_view(make_camera(fov=90, position=(1, 2, 3)))
+
+    # Blender is Z up, the json is Y up with the camera looking down -Z
+    for a, b in zip(position, (1, -3, 2)):
+        assert_close(a, b)
+    for a, b in zip(right, (1, 0, 0)):
+        assert_close(a, b)
+    for a, b in zip(up, (0, 0, 1)):
+        assert_close(a, b)
+    for a, b in zip(forward, (0, 1, 0)):
+        assert_close(a, b)
+    assert_close(tan_half, 1)
+
+def test_camera_view_turns_with_the_camera():
+    position, right, up, forward, tan_half = camera_view(make_camera(rotation=(0, math.radians(90), 0)))
+
+    # Turned left around the up axis
+    for a, b in zip(forward, (-1, 0, 0)):
+        assert_close(a, b)
+
+def test_projected_pixels_shrink_with_distance():
+    view = camera_view(make_camera(fov=90))
+
+    assert_close(projected_pixels(view, (0, 10, 0), 2, 1000, 500), 100)
+    assert_close(projected_pixels(view, (0, 20, 0), 2, 1000, 500), 50)
+
+def test_projected_pixels_of_hidden_objects_are_zero():
+    view = camera_view(make_camera(fov=90))
+
+    assert projected_pixels(view, (0, -10, 0), 2, 1000, 1000) == 0
+    assert projected_pixels(view, (30, 10, 0), 2, 1000, 1000) == 0
+    # Wider than tall, a point above the frame at this depth
+    assert projected_pixels(view, (0, 10, 8), 2, 1000, 500) == 0
+    assert projected_pixels(view, (0, 0.5, 0), 2, 1000, 1000) == 1000
+
+def test_primitives_are_sized_by_their_shape():
+    data = {'camera': make_camera(fov=90), 'objects': [
+        make_object('Sphere', 'mesh', (0, 0, -10), 0),
+        make_object('model', 'gltf', (0, 0, -10), 1),
+        make_object('model', 'gltf', (0, 0, -10), 2, scale=3),
+    ]}
+
+    plan_texture_sizes(data, 2000, 2000)
+
+    # The 9 m sphere covers 900 pixels, the glb is assumed GLB_EXTENT metres wide
+    assert GLB_EXTENT * 100 <= 512
+    assert [obj[PLAN_KEY]['color'] for obj in data['objects']] == ['medium', 'small', 'medium']
+
+def test_budget_steps_down_the_textures_losing_least_detail():
+    def scene():
+        return {'camera': make_camera(fov=90), 'objects': [
+            make_object('near', 'gltf', (0, 0, -1), 0),
+            make_object('far', 'gltf', (0, 0, -2), 1),
+        ]}
+
+    data = scene()
+    plan = plan_texture_sizes(data, 2048, 2048)
+    assert [obj[PLAN_KEY]['color'] for obj in data['objects']] == ['large', 'large']
+    assert plan['bytes'] == 2 * 2048 * 2048 * 4
+
+    # One step down fits, taken by the far object that needs fewer pixels
+    data = scene()
+    plan = plan_texture_sizes(data, 2048, 2048, budget_bytes=(2048 * 2048 + 1024 * 1024) * 4)
+    assert [obj[PLAN_KEY]['color'] for obj in data['objects']] == ['large', 'medium']
+    assert plan['textures'] == {'large': 1, 'medium': 1}
+    assert not plan['over_budget']
+
+    # Nothing fits: everything ends at the smallest size
+    data = scene()
+    plan = plan_texture_sizes(data, 2048, 2048, budget_bytes=1)
+    assert [obj[PLAN_KEY]['color'] for obj in data['objects']] == ['small', 'small']
+    assert plan['over_budget']
+
+def test_shared_textures_get_the_size_of_their_largest_object():
+    data = {'camera': make_camera(fov=90), 'objects': [
+        make_object('near', 'gltf', (0, 0, -1), 0),
+        make_object('far', 'gltf', (0, 0, -100), 0),
+    ]}
+
+    plan = plan_texture_sizes(data, 2048, 2048)
+
+    assert [obj[PLAN_KEY]['color'] for obj in data['objects']] == ['large', 'large']
+    assert plan['textures'] == {'large': 1}
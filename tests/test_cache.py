@@ -0,0 +1,193 @@
+import os
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pbr_importer.cache import AssetCache, CacheMissError
+from pbr_importer.downloader import Downloader, DownloadError
+
+
+# Files served by the stand-in asset server by path
+FILES = {
+    '/a.bin': b'a' * 100,
+    '/b.bin': b'b' * 100,
+    '/c.bin': b'c' * 100,
+}
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    """Serves FILES with an ETag and answers 304 to a matching If-None-Match"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        etag = '"{0}"'.format(hashlib.sha256(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), AssetHandler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def requests(server):
+    server.requests.clear()
+    return server.requests
+
+def url_of(server, path):
+    return "http://127.0.0.1:{0}{1}".format(server.server_address[1], path)
+
+def make_cache(path, **kwargs):
+    return AssetCache(str(path), downloader=Downloader(retries=0), **kwargs)
+
+def entry_of(cache, url, ext):
+    return cache.entries[os.path.basename(cache.filename(url, ext))]
+
+
+def test_revalidation_304_refreshes_validated(server, requests, tmp_path):
+    cache = make_cache(tmp_path, ttl=0)
+    url = url_of(server, '/a.bin')
+
+    path = cache.fetch(url, '.bin')
+    validated = entry_of(cache, url, '.bin')['validated']
+    time.sleep(0.01)
+    assert cache.fetch(url, '.bin') == path
+
+    assert requests[0] == ('/a.bin', None)
+    assert requests[1][1] is not None
+    assert cache.downloader.results[-1].status == 304
+    assert entry_of(cache, url, '.bin')['validated'] > validated
+    with open(path, mode='rb') as file:
+        assert file.read() == FILES['/a.bin']
+
+def test_fresh_entries_are_not_revalidated_until_ttl(server, requests, tmp_path):
+    cache = make_cache(tmp_path, ttl=3600)
+    url = url_of(server, '/a.bin')
+
+    cache.fetch(url, '.bin')
+    cache.fetch(url, '.bin')
+    assert len(requests) == 1
+    assert cache.status(url, '.bin')[0] == 'cached'
+
+    # Validated two hours ago
+    key = os.path.basename(cache.filename(url, '.bin'))
+    def age(entries):
+        entries[key]['validated'] -= 7200
+    cache._update(age)
+    assert cache.status(url, '.bin')[0] == 'stale'
+
+    cache.fetch(url, '.bin')
+    assert len(requests) == 2
+    assert cache.status(url, '.bin')[0] == 'cached'
+
+def test_offline_cache_misses_raise(server, requests, tmp_path):
+    url = url_of(server, '/a.bin')
+    offline = make_cache(tmp_path, offline=True)
+
+    with pytest.raises(CacheMissError):
+        offline.fetch(url, '.bin')
+
+    # Files cached by an online process are served without requests, even when stale
+    make_cache(tmp_path, ttl=0).fetch(url, '.bin')
+    offline.reload()
+    time.sleep(0.01)
+    assert os.path.exists(offline.fetch(url, '.bin'))
+    assert len(requests) == 1
+
+def test_not_found_raises_without_entry(server, requests, tmp_path):
+    cache = make_cache(tmp_path)
+    url = url_of(server, '/missing.bin')
+
+    with pytest.raises(DownloadError) as error:
+        cache.fetch(url, '.bin')
+
+    assert error.value.status == 404
+    assert cache.lookup(url, '.bin') is None
+    assert make_cache(tmp_path).entries == {}
+    assert not os.path.exists(cache.filename(url, '.bin'))
+    assert [name for name in os.listdir(str(tmp_path)) if name.endswith('.part')] == []
+
+def test_least_recently_used_entries_are_evicted(server, requests, tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    a, b, c = (url_of(server, path) for path in ('/a.bin', '/b.bin', '/c.bin'))
+
+    cache.fetch(a, '.bin')
+    cache.fetch(b, '.bin')
+    time.sleep(0.01)
+    cache.fetch(a, '.bin')
+    cache.save()
+    cache.fetch(c, '.bin')
+
+    assert cache.lookup(a, '.bin') is not None
+    assert cache.lookup(b, '.bin') is None
+    assert cache.lookup(c, '.bin') is not None
+    assert cache.size() <= 250
+
+def test_access_times_of_a_job_are_shared_with_other_processes(tmp_path):
+    a = make_cache(tmp_path)
+    with a.job():
+        a.make('a', '.bin', lambda path: open(path, mode='wb').write(FILES['/a.bin']))
+        a.make('b', '.bin', lambda path: open(path, mode='wb').write(FILES['/b.bin']))
+        time.sleep(0.01)
+        a.make('a', '.bin', lambda path: None)
+
+    b = make_cache(tmp_path, max_bytes=250)
+    b.make('c', '.bin', lambda path: open(path, mode='wb').write(FILES['/c.bin']))
+
+    assert b.lookup('a', '.bin') is not None
+    assert b.lookup('b', '.bin') is None
+
+def test_files_of_the_current_job_are_not_evicted(server, requests, tmp_path):
+    cache = make_cache(tmp_path, max_bytes=150)
+    a, b = url_of(server, '/a.bin'), url_of(server, '/b.bin')
+
+    with cache.job():
+        cache.fetch(a, '.bin')
+        cache.fetch(b, '.bin')
+        assert cache.lookup(a, '.bin') is not None
+        assert cache.lookup(b, '.bin') is not None
+
+    # Evicted by the next store once the job is over
+    cache.fetch(url_of(server, '/c.bin'), '.bin')
+    assert cache.size() <= 150
+
+def test_files_used_again_are_kept_for_the_job(server, requests, tmp_path):
+    cache = make_cache(tmp_path, max_bytes=150)
+    a, b = url_of(server, '/a.bin'), url_of(server, '/b.bin')
+
+    path = cache.fetch(a, '.bin')
+    with cache.job():
+        cache.use(path)
+        cache.fetch(b, '.bin')
+
+    assert os.path.exists(path)
@@ -0,0 +1,80 @@
+import io
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pbr_importer.downloader import Downloader
+
+
+# Body served for every path
+BODY = b'x' * 100
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Serves BODY and closes connections idle for more than timeout seconds"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = 0.2
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def address_of(server):
+    return "127.0.0.1:{0}".format(server.server_address[1])
+
+@pytest.fixture
+def no_proxy(monkeypatch):
+    for name in ('http_proxy', 'https_proxy', 'no_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def test_connection_closed_while_idle_is_replaced(server, no_proxy):
+    downloader = Downloader(retries=0)
+    url = "http://{0}/a.bin".format(address_of(server))
+
+    downloader.download(url, io.BytesIO())
+    time.sleep(0.5)
+    out = io.BytesIO()
+    result = downloader.download(url, out)
+
+    assert out.getvalue() == BODY
+    assert result.attempts == 1
+    assert len(server.requests) == 2
+
+def test_http_requests_go_through_the_proxy(server, no_proxy):
+    no_proxy.setenv('http_proxy', "http://user:secret@{0}".format(address_of(server)))
+    downloader = Downloader(retries=0)
+
+    downloader.download("http://assets.invalid/a.bin", io.BytesIO())
+
+    assert server.requests == ["http://assets.invalid/a.bin"]
+
+def test_no_proxy_hosts_are_reached_directly(server, no_proxy):
+    no_proxy.setenv('http_proxy', "http://proxy.invalid:3128")
+    no_proxy.setenv('no_proxy', '127.0.0.1')
+    downloader = Downloader(retries=0)
+
+    downloader.download("http://{0}/a.bin".format(address_of(server)), io.BytesIO())
+
+    assert server.requests == ['/a.bin']
@@ -0,0 +1,126 @@
+import os
+import sys
+import shlex
+import time
+
+from pbr_importer import farm
+from pbr_importer.batch import read_report
+
+
+# Stand-in for blender --background --python pbr_import.py --, renders a manifest into empty files
+WORKER = r'''
+import os
+import sys
+import json
+import time
+
+args = sys.argv[1:]
+def option(name):
+    return args[args.index(name) + 1] if name in args else None
+
+output = option('--output')
+marker = option('--marker')
+delay = float(option('--delay') or 0)
+jobs = [json.loads(line) for line in open(option('--input'))]
+
+results = []
+for job in jobs:
+    # Fail once per farm, after the first scene of the shard was reported
+    if len(results) == 1 and marker is not None and not os.path.exists(marker):
+        open(marker, 'w').close()
+        if option('--fail') == 'crash':
+            sys.exit(3)
+        time.sleep(60)
+
+    time.sleep(delay)
+    with open(os.path.join(output, job['output']), 'w') as file:
+        file.write(job['input'])
+    with open(option('--renders'), 'a') as file:
+        file.write(job['output'] + '\n')
+
+    results.append({'input': job['input'], 'output': os.path.join(os.path.abspath(output), job['output']), 'status': 'ok', 'error': None, 'seconds': 0})
+    with open(option('--report'), 'w') as file:
+        json.dump({'jobs': results}, file)
+'''
+
+def make_scenes(path, count):
+    scenes = path / 'scenes'
+    scenes.mkdir()
+    for i in range(count):
+        (scenes / "scene{0}.json".format(i)).write_text('{}')
+    return scenes
+
+def make_worker(path):
+    worker = path / 'worker.py'
+    worker.write_text(WORKER)
+    return [sys.executable, str(worker)]
+
+def read_renders(path):
+    return (path / 'renders.txt').read_text().split()
+
+
+def test_crashed_worker_is_retried_and_reports_are_merged(tmp_path):
+    scenes = make_scenes(tmp_path, 4)
+    output = tmp_path / 'output'
+    worker = shlex.join(make_worker(tmp_path))
+
+    code = farm.main(['--input', str(scenes), '--output', str(output), '--workers', '2', '--retries', '1', '--worker_command', worker,
+                      '--', '--fail', 'crash', '--marker', str(tmp_path / 'marker'), '--renders', str(tmp_path / 'renders.txt')])
+
+    assert code == 0
+    report = read_report(str(output / 'report.json'))
+    assert [os.path.basename(result['output']) for result in report] == ["scene{0}.jpg".format(i) for i in range(4)]
+    assert all(result['status'] == 'ok' for result in report)
+
+    # Only the scene lost with the crashed worker is rendered again
+    assert sorted(read_renders(tmp_path)) == ["scene{0}.jpg".format(i) for i in range(4)]
+
+def test_only_the_scene_a_worker_crashed_on_fails(tmp_path):
+    jobs = [(str(tmp_path / "scene{0}.json".format(i)), "scene{0}.jpg".format(i)) for i in range(3)]
+    extra_args = ['--fail', 'crash', '--marker', str(tmp_path / 'marker'), '--renders', str(tmp_path / 'renders.txt')]
+
+    results = farm.run(jobs, str(tmp_path / 'output'), make_worker(tmp_path), 1, 1, extra_args, retries=0, work_dir=str(tmp_path))
+
+    # The scenes after the crash are queued again without using up their retries
+    assert [result['status'] for result in results] == ['ok', 'crashed', 'ok']
+    assert results[1]['error'] == "worker exited with code 3"
+    assert read_renders(tmp_path) == ['scene0.jpg', 'scene2.jpg']
+
+def test_broken_workers_fail_every_scene(tmp_path):
+    jobs = [(str(tmp_path / "scene{0}.json".format(i)), "scene{0}.jpg".format(i)) for i in range(10)]
+
+    results = farm.run(jobs, str(tmp_path / 'output'), [sys.executable, '-c', 'raise SystemExit(1)'], 2, 1, retries=5, work_dir=str(tmp_path))
+
+    assert all(result['status'] == 'crashed' for result in results)
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.jsonl')]) == 2 * farm.MAX_EMPTY_ROUNDS
+
+def test_hung_worker_is_killed_and_retried(tmp_path):
+    jobs = [(str(tmp_path / "scene{0}.json".format(i)), "scene{0}.jpg".format(i)) for i in range(3)]
+    extra_args = ['--fail', 'hang', '--marker', str(tmp_path / 'marker'), '--renders', str(tmp_path / 'renders.txt')]
+
+    start = time.time()
+    results = farm.run(jobs, str(tmp_path / 'output'), make_worker(tmp_path), 1, 1, extra_args, retries=1, work_dir=str(tmp_path), timeout=3)
+
+    assert time.time() - start < 30
+    assert [result['status'] for result in results] == ['ok', 'ok', 'ok']
+    assert sorted(read_renders(tmp_path)) == ["scene{0}.jpg".format(i) for i in range(3)]
+
+def test_timeout_counts_as_failed_attempt(tmp_path):
+    jobs = [(str(tmp_path / "scene{0}.json".format(i)), "scene{0}.jpg".format(i)) for i in range(2)]
+    extra_args = ['--fail', 'hang', '--marker', str(tmp_path / 'marker'), '--renders', str(tmp_path / 'renders.txt')]
+
+    results = farm.run(jobs, str(tmp_path / 'output'), make_worker(tmp_path), 1, 1, extra_args, retries=0, work_dir=str(tmp_path), timeout=1)
+
+    assert results[0]['status'] == 'ok'
+    assert results[1]['status'] == 'crashed'
+    assert results[1]['error'] == "worker timed out after 1 seconds without finishing a scene"
+
+def test_timeout_applies_per_scene(tmp_path):
+    jobs = [(str(tmp_path / "scene{0}.json".format(i)), "scene{0}.jpg".format(i)) for i in range(6)]
+    extra_args = ['--delay', '0.5', '--renders', str(tmp_path / 'renders.txt')]
+
+    results = farm.run(jobs, str(tmp_path / 'output'), make_worker(tmp_path), 1, 1, extra_args, retries=0, work_dir=str(tmp_path), timeout=1.5)
+
+    # The shard takes longer than the timeout but reports a scene every half second
+    assert all(result['status'] == 'ok' for result in results)
+    assert read_renders(tmp_path) == ["scene{0}.jpg".format(i) for i in range(6)]
@@ -0,0 +1,167 @@
+import types
+
+import fake_bpy
+
+bpy = fake_bpy.install()
+
+from scenes import make_scene
+from pbr_importer.hierarchy import HierarchyIndex
+from pbr_importer.incremental import ID_PROPERTY, update_scene
+from pbr_importer.scene_diff import diff_states, object_identities, scene_state
+
+
+# Builders adding a root per part and a child per object, recording what they were called with
+def make_builders():
+    calls = []
+    hierarchy = HierarchyIndex()
+
+    def add(name, parent=None):
+        obj = fake_bpy.Object(name)
+        obj.parent = parent
+        bpy.data.objects.append(obj)
+        hierarchy.add([obj])
+        return obj
+
+    def create(kind):
+        def create_part(data):
+            calls.append((kind, data))
+            return add(kind)
+        return create_part
+
+    def build_object(data):
+        calls.append(('object', data['name']))
+        root = add(data['name'])
+        add(data['name'] + '-mesh', root)
+        return [root]
+
+    def set_obj_transform(data, obj):
+        calls.append(('move', obj.name, tuple(data['position'])))
+
+    return types.SimpleNamespace(
+        hierarchy=hierarchy,
+        calls=calls,
+        create_camera=create('camera'),
+        create_light=create('light'),
+        create_floor=create('floor'),
+        import_hdri=lambda url: calls.append(('environment', url)),
+        build_object=build_object,
+        set_obj_transform=set_obj_transform,
+    )
+
+def make_data(count=4):
+    data = make_scene(count, duplicates=0)
+    for i, obj in enumerate(data['objects']):
+        obj['name'] = "object{0}".format(i)
+    return data
+
+def objects_of(identity):
+    return [obj for obj in bpy.data.objects if obj.get(ID_PROPERTY) == identity]
+
+def setup_function():
+    bpy.data.objects.clear()
+
+
+def test_objects_are_identified_by_id_or_name_and_rank():
+    objects = [{'name': 'chair'}, {'name': 'chair'}, {'name': 'table', 'id': 7}, {'name': 'lamp', 'uuid': 'abc'}]
+
+    assert [identity for identity, obj in object_identities(objects)] == ['chair#0', 'chair#1', 'id:7', 'id:abc']
+
+def test_diff_sorts_moves_content_changes_and_deletions():
+    data = make_data()
+    old = scene_state(data)
+
+    data['objects'][0]['position'] = [1, 2, 3]
+    data['objects'][1]['materialData']['materialProps']['roughness'] = 0.123
+    del data['objects'][2]
+    data['light']['object']['intensity'] = 2
+    changes = diff_states(old, scene_state(data))
+
+    assert changes['move'] == ['object0#0']
+    assert sorted(changes['rebuild']) == ['light', 'object1#0']
+    assert changes['delete'] == ['object2#0']
+    assert changes['create'] == []
+    assert sorted(changes['keep']) == ['camera', 'environment', 'floor', 'object3#0']
+
+def test_option_change_rebuilds_everything():
+    data = make_data()
+
+    changes = diff_states(scene_state(data, ['large', 'gltf_original']), scene_state(data, ['medium', 'gltf_original']))
+
+    assert len(changes['delete']) == len(changes['create']) == 8
+    assert changes['keep'] == changes['move'] == changes['rebuild'] == []
+
+def test_first_update_builds_every_part():
+    data = make_data()
+    builders = make_builders()
+    state = {}
+
+    update_scene(data, state, builders)
+
+    assert [call[0] for call in builders.calls] == ['camera', 'light', 'environment', 'floor'] + ['object'] * 4
+    assert len(objects_of('object0#0')) == 2
+    assert state == scene_state(data)
+
+def test_moved_objects_only_get_a_new_transform():
+    data = make_data()
+    builders = make_builders()
+    state = {}
+    update_scene(data, state, builders)
+    built = objects_of('object1#0')
+    builders.calls.clear()
+
+    data['objects'][1]['position'] = [5, 6, 7]
+    changes = update_scene(data, state, builders)
+
+    assert changes['move'] == ['object1#0']
+    assert builders.calls == [('move', 'object1', (5, 6, 7))]
+    assert objects_of('object1#0') == built
+    assert state == scene_state(data)
+
+def test_changed_objects_are_rebuilt_and_deleted_ones_removed():
+    data = make_data()
+    builders = make_builders()
+    state = {}
+    update_scene(data, state, builders)
+    old = objects_of('object1#0')
+    builders.calls.clear()
+
+    data['objects'][1]['materialData']['materialProps']['roughness'] = 0.123
+    del data['objects'][3]
+    update_scene(data, state, builders)
+
+    assert builders.calls == [('object', 'object1')]
+    assert all(obj not in bpy.data.objects for obj in old)
+    assert len(objects_of('object1#0')) == 2
+    assert objects_of('object3#0') == []
+    assert state == scene_state(data)
+
+def test_option_change_rebuilds_the_scene():
+    data = make_data()
+    builders = make_builders()
+    state = {}
+    update_scene(data, state, builders, ['large', 'gltf_original'])
+    count = len(bpy.data.objects)
+    builders.calls.clear()
+
+    update_scene(data, state, builders, ['medium', 'gltf_original'])
+
+    assert len(builders.calls) == 8
+    assert len(bpy.data.objects) == count
+    assert state == scene_state(data, ['medium', 'gltf_original'])
+
+def test_parts_deleted_by_hand_are_built_again():
+    data = make_data()
+    builders = make_builders()
+    state = {}
+    update_scene(data, state, builders)
+    for obj in objects_of('object2#0') + objects_of('camera'):
+        bpy.data.objects.remove(obj)
+    untagged = fake_bpy.Object('added by hand')
+    bpy.data.objects.append(untagged)
+    builders.calls.clear()
+
+    update_scene(data, state, builders)
+
+    assert [call[0] for call in builders.calls] == ['camera', 'object']
+    assert len(objects_of('object2#0')) == 2
+    assert untagged not in bpy.data.objects
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pbr_importer.preprocess import collect_images, prepare_image
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_16_bit_images_are_scaled_not_clipped(tmp_path):
+    ramp = np.linspace(0, 65535, 256 * 4, dtype=np.uint16).reshape(4, 256)
+    source = str(tmp_path / 'height.png')
+    Image.fromarray(ramp).save(source)
+
+    target = str(tmp_path / 'height.tga')
+    prepare_image(source, target)
+
+    with Image.open(target) as prepared:
+        assert prepared.mode == 'L'
+        pixels = np.asarray(prepared, dtype=np.int64)
+    assert np.abs(pixels - np.round(ramp / 257)).max() <= 1
+    assert (pixels == 255).mean() < 0.01
+
+def test_textures_keep_their_size(tmp_path):
+    source = str(tmp_path / 'color.png')
+    Image.new('RGB', (4096, 16), (200, 100, 50)).save(source)
+
+    target = str(tmp_path / 'color.tga')
+    prepare_image(source, target)
+
+    with Image.open(target) as prepared:
+        assert prepared.size == (4096, 16)
+
+def test_images_are_resized_to_width_and_height(tmp_path):
+    source = str(tmp_path / 'picture.png')
+    Image.new('RGBA', (300, 200)).save(source)
+
+    target = str(tmp_path / 'picture.tga')
+    prepare_image(source, target, 64, 32)
+
+    with Image.open(target) as prepared:
+        assert prepared.size == (64, 32)
+
+
+def make_object(name, type, files):
+    return {'name': name, 'type': type, 'materialData': {'files': files, 'materialProps': {}}, 'files': {'gltf_original': name + '.glb'}}
+
+def test_collect_images_only_lists_built_objects():
+    data = {
+        'environment': 'sky.hdr',
+        'floor': {'files': {'large_color': 'floor.png'}},
+        'objects': [
+            make_object('Sphere', 'mesh', {'large_color': 'sphere.png', 'large_roughness': 'rough.png'}),
+            make_object('model', 'gltf', {'large_normal': 'model.png'}),
+            make_object('Teapot', 'mesh', {'large_color': 'unused.png'}),
+            {'name': 'frame', 'type': 'dynamic', 'files': {'medium': 'frame.glb'}, 'dynamicMaterialProps': {'files': 'picture.png', 'width': 64, 'height': 32}},
+        ],
+    }
+
+    jobs = collect_images(data, 'large', 'gltf_original')
+
+    assert [job['key'] for job in jobs] == [
+        ('floor.png', None, None, None),
+        ('sphere.png', None, None, None),
+        ('rough.png', None, None, 'Non-Color'),
+        ('model.png', None, None, 'Non-Color'),
+        ('picture.png', 64, 32, None),
+    ]
+    assert jobs[2]['mode'] == 'L'
+    assert (jobs[4]['width'], jobs[4]['height']) == (64, 32)
+    assert all('max_side' not in job for job in jobs)
@@ -0,0 +1,54 @@
+import copy
+
+from scenes import make_scene
+
+from pbr_importer.schema import validate_scene
+
+
+def test_generated_scenes_are_valid():
+    assert validate_scene(make_scene(50), 'gltf_original') == []
+
+def test_missing_scene_parts_are_reported():
+    data = make_scene(5)
+    del data['camera']
+    del data['objects']
+
+    assert validate_scene(data, 'gltf_original') == ['camera: missing', 'objects: missing']
+
+def test_errors_are_reported_with_their_path():
+    data = make_scene(5, duplicates=0)
+    data['camera']['object']['fov'] = 'wide'
+    data['light']['object']['intensity'] = True
+    data['objects'][0]['position'] = [0, 1]
+    del data['objects'][1]['materialData']
+    data['objects'].append({'name': 'nameless'})
+
+    assert validate_scene(data, 'gltf_original') == [
+        'camera.object.fov: expected number, got string',
+        'light.object.intensity: expected number, got boolean',
+        'objects[0].position: expected at least 3 items, got 2',
+        'objects[1].materialData: missing',
+        'objects[5].type: missing',
+    ]
+
+def test_dynamic_objects_need_their_material_props():
+    data = make_scene(0)
+    frame = {'name': 'frame', 'type': 'dynamic', 'position': [0, 0, 0], 'rotation': [0, 0, 0], 'scale': [1, 1, 1],
+             'materialData': {'materialProps': {}}, 'files': {'medium': 'frame.glb'},
+             'dynamicMaterialProps': {'files': 'picture.png', 'width': None, 'height': None, 'repeat': {'x': 1, 'y': 1}}}
+    data['objects'] = [frame]
+    assert validate_scene(data, 'gltf_original') == ['objects[0].dynamicMaterialProps.offset: missing']
+
+    props = copy.deepcopy(frame['dynamicMaterialProps'])
+    del props['width']
+    props['repeat'] = None
+    frame['dynamicMaterialProps'] = props
+    assert validate_scene(data, 'gltf_original') == ['objects[0].dynamicMaterialProps.width: missing']
+
+def test_gltf_objects_need_the_mesh_size():
+    data = make_scene(0)
+    data['objects'] = [{'name': 'model', 'type': 'gltf', 'position': [0, 0, 0], 'rotation': [0, 0, 0], 'scale': [1, 1, 1],
+                        'materialData': {'materialProps': {}}, 'files': {'medium': 'model.glb'}}]
+
+    assert validate_scene(data, 'gltf_original') == ['objects[0].files.gltf_original: missing']
+    assert validate_scene(data, 'medium') == []
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+from scenes import make_scene
+
+from pbr_importer.schema import SceneValidationError
+from pbr_importer.stream import iter_objects, iter_scene, load_scene
+
+
+# Values that end at every kind of chunk boundary: split numbers, exponents, literals and escapes
+VALUES = [12345, -0.5, 1.5e-07, 2E+10, True, False, None, "a \"quoted\" \\u00e9 string", {'nested': [1, [2, 3]]}]
+
+def write_scene(path, data):
+    with open(str(path), mode='w') as file:
+        json.dump(data, file)
+    return str(path)
+
+
+def test_values_split_across_chunks_are_decoded(tmp_path):
+    data = make_scene(3)
+    data['objects'] = [dict(obj, extra=VALUES) for obj in data['objects']]
+    data['numbers'] = 1e5
+    path = write_scene(tmp_path / 'scene.json', data)
+
+    for chunk_size in range(1, 40):
+        assert load_scene(path, 'gltf_original', chunk_size=chunk_size) == data
+
+def test_top_level_numbers_split_across_chunks_are_decoded(tmp_path):
+    path = tmp_path / 'numbers.json'
+    path.write_text('{"a": 100000.0, "b": 1.5e-07, "c": -25, "d": 2E+10}')
+
+    for chunk_size in range(1, 20):
+        assert list(iter_scene(str(path), chunk_size=chunk_size)) == [(('a',), 1e5), (('b',), 1.5e-07), (('c',), -25), (('d',), 2e10)]
+
+def test_objects_are_streamed_one_by_one(tmp_path):
+    data = make_scene(10)
+    path = write_scene(tmp_path / 'scene.json', data)
+
+    assert list(iter_objects(path, chunk_size=7)) == data['objects']
+
+def test_all_errors_are_raised_together(tmp_path):
+    data = make_scene(3)
+    del data['floor']
+    data['objects'][2]['scale'] = 'large'
+    path = write_scene(tmp_path / 'scene.json', data)
+
+    with pytest.raises(SceneValidationError) as error:
+        load_scene(path, 'gltf_original', chunk_size=16)
+
+    assert error.value.errors == ['objects[2].scale: expected array, got string', 'floor: missing']
+
+def test_truncated_scenes_raise(tmp_path):
+    path = tmp_path / 'scene.json'
+    path.write_text(json.dumps(make_scene(3))[:-20])
+
+    with pytest.raises(ValueError):
+        load_scene(str(path), 'gltf_original', chunk_size=16)
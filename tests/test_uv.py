@@ -0,0 +1,53 @@
+import numpy as np
+
+from fake_bpy import UVLayer
+from pbr_importer.uv import flip_layers_y, flip_normalize_y, read_uvs
+
+
+def make_layer(uvs):
+    return UVLayer(np.array(uvs, dtype=np.float32).reshape(-1, 2))
+
+def expected_flip(uvs):
+    uvs = np.array(uvs, dtype=np.float64).reshape(-1, 2)
+    if len(uvs) > 0:
+        uvs[:, 1] = uvs[:, 1].max() - uvs[:, 1]
+    return uvs.astype(np.float32)
+
+
+def test_each_layer_flips_within_its_own_extent():
+    random = np.random.default_rng(0)
+    layers_uvs = [random.uniform(-1, 2, size=(50, 2)), random.uniform(3, 5, size=(7, 2)), random.uniform(0, 1, size=(1, 2))]
+    layers = [make_layer(uvs) for uvs in layers_uvs]
+
+    flip_layers_y(layers)
+
+    for layer, uvs in zip(layers, layers_uvs):
+        np.testing.assert_array_equal(read_uvs(layer), expected_flip(np.float32(uvs)))
+
+def test_layer_starting_at_zero_is_flipped():
+    uvs = [[0.25, 0.0], [0.5, 0.5], [0.75, 1.5]]
+    layer = make_layer(uvs)
+
+    flip_layers_y([layer])
+
+    np.testing.assert_array_equal(read_uvs(layer), np.float32([[0.25, 1.5], [0.5, 1.0], [0.75, 0.0]]))
+
+def test_x_is_untouched():
+    uvs = np.float32([[-3.5, 0.0], [7.25, 2.0]])
+    layer = make_layer(uvs)
+
+    flip_layers_y([layer])
+
+    np.testing.assert_array_equal(read_uvs(layer)[:, 0], uvs[:, 0])
+
+def test_empty_layers_are_left_empty():
+    empty = make_layer([])
+    other = make_layer([[0.0, 1.0], [1.0, 3.0]])
+
+    flip_layers_y([empty, other])
+
+    assert read_uvs(empty).shape == (0, 2)
+    np.testing.assert_array_equal(read_uvs(other), np.float32([[0.0, 2.0], [1.0, 0.0]]))
+
+def test_flip_normalize_y_of_no_uvs():
+    assert flip_normalize_y(np.empty((0, 2), dtype=np.float32)).shape == (0, 2)